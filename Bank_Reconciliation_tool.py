@@ -1,215 +1,150 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime
 import os
 import glob
-import time
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-
-def clean_gl_data(file_path):
-    df = pd.read_excel(file_path, sheet_name='sheet1', skiprows=1)
-    df.columns = df.columns.str.strip().str.lower()
-    
-    if 'account' in df.columns:
-        df['account'] = df['account'].astype(str).str.strip()
-        filtered_df = df[df['account'] == '115307']
-        
-        new_columns = {
-            'journal date': 'Date',
-            'user': 'Reference',
-            'line description': 'Description',
-            'base amount': 'Base Amount'
-        }
-        cleaned_df = filtered_df[list(new_columns)].rename(columns=new_columns)
-        cleaned_df['Date'] = pd.to_datetime(cleaned_df['Date']).dt.date
-        
-        return cleaned_df if not cleaned_df.empty else None
-    return None
+import json
+import multiprocessing
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, NamedStyle, Side
+from openpyxl.utils import get_column_letter
+
+from bank_matching import build_results, match_all
+from excel_reader import iter_sheet_rows, read_sheet
+from parse_cache import cached_frame
+from reconciliation_ledger import ReconciliationLedger
+from stage_timer import StageTimer
+
+# 匹配方式：默认 exact 按金额完全相等顺序认领，与原有结果一致；
+# BANK_MATCH_MODE=window 时按金额容差和日期远近挑选 GL 行，容差和日期窗口由
+# BANK_MATCH_TOLERANCE（元）/ BANK_MATCH_WINDOW_DAYS（天）调整
+MATCH_MODE = os.environ.get('BANK_MATCH_MODE', 'exact')
+MATCH_TOLERANCE = float(os.environ.get('BANK_MATCH_TOLERANCE', '0'))
+MATCH_WINDOW_DAYS = int(os.environ['BANK_MATCH_WINDOW_DAYS']) if os.environ.get('BANK_MATCH_WINDOW_DAYS') else None
+# 第二轮一对多 / 多对一匹配：默认关闭，BANK_GROUP_MATCH=1 时开启，只组合对方户名出现在 GL 摘要中的行；
+# BANK_GROUP_ANY_PARTY=1 时找不到再跨对方户名组合（容易凑出无关的组合）
+GROUP_MATCH = os.environ.get('BANK_GROUP_MATCH', '0') == '1'
+GROUP_ANY_PARTY = os.environ.get('BANK_GROUP_ANY_PARTY', '0') == '1'
+# 对帐台帐：已核销的流水以后不再匹配，未达项结转到下次。默认关闭，同一期间可以反复重跑；
+# 设置 BANK_LEDGER 为台帐文件路径（如 reconciliation_ledger.db）时开启
+LEDGER_PATH = os.environ.get('BANK_LEDGER', '0')
+
+# 银行流水文件与总帐科目的对应关系，JSON 格式：{"115307": ["bank*.xls"], "115308": ["boc*.xls"]}
+# 配置文件不存在时只核对科目 115307 与 bank*.xls；多个科目时并行匹配，每个科目一个工作簿
+ACCOUNT_MAP_FILE = os.environ.get('BANK_ACCOUNT_MAP', 'bank_accounts.json')
+MATCH_WORKERS = int(os.environ['BANK_WORKERS']) if os.environ.get('BANK_WORKERS') else None
+
+GL_ACCOUNT = '115307'
+
+GL_COLUMNS = {
+    'journal date': 'Date',
+    'user': 'Reference',
+    'line description': 'Description',
+    'base amount': 'Base Amount'
+}
 
-def process_bank_data(file_path):
-    df = pd.read_excel(file_path, engine='xlrd', skiprows=8)
-    default_payee_name = "海南空港开发产业集团有限公司琼中福朋喜来登酒店分公司"
-    
-    def convert_date_format(date_str):
-        try:
-            return datetime.strptime(str(date_str), '%Y%m%d').strftime('%Y-%m-%d')
-        except ValueError:
-            return date_str
-    
-    new_rows = []
-    for _, row in df.iterrows():
-        transaction_date = convert_date_format(row.get('交易日期[ Transaction Date ]', ''))
-        payee_name = row.get('收款人名称[ Payee\'s Name ]', np.nan)
-        if pd.isna(payee_name) or str(payee_name).strip() == '':
-            payee_name = default_payee_name
-        
-        trade_amount = float(row.get('交易金额[ Trade Amount ]', 0.0))
-        debit_credit = "收款" if trade_amount > 0 else "付款" if trade_amount < 0 else ""
-        
-        new_row = {
-            '日期': transaction_date,
-            '对方户名': payee_name,
-            '用途': row.get('用途[ Purpose ]', ''),
-            '交易金额': trade_amount,
-            '借方/贷方': debit_credit,
-            '交易流水号': str(row.get('交易流水号[ Transaction reference number ]', ''))
-        }
-        new_rows.append(new_row)
-    
-    return pd.DataFrame(new_rows)
+def _account_text(value):
+    """科目单元格转为文本，数字科目（如 115307.0）与文本科目一致"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def _filter_gl_rows(rows, accounts):
+    """逐行筛选：只保留科目在 accounts 中的行，以及科目和需要的四列"""
+    header = next(rows, None)
+    if not header:
+        return None
+    names = ['' if name is None else str(name).strip().lower() for name in header]
+    if 'account' not in names:
+        return None
+    missing = [name for name in GL_COLUMNS if name not in names]
+    if missing:
+        raise ValueError(f"总帐缺少列：{', '.join(missing)}")
+
+    account_index = names.index('account')
+    indexes = [names.index(name) for name in GL_COLUMNS]
+    width = max(indexes + [account_index]) + 1
+
+    kept = []
+    for row in rows:
+        if len(row) <= account_index or row[account_index] is None:
+            continue
+        account = _account_text(row[account_index])
+        if account in accounts:
+            row = row + [None] * (width - len(row))
+            kept.append([account] + [np.nan if row[i] is None else row[i] for i in indexes])
+    return kept
+
+def read_gl_accounts(file_path, accounts=(GL_ACCOUNT,)):
+    """读取总帐，保留 accounts 中各科目的行，返回带 Account 列的 DataFrame；没有数据时返回 None
+
+    以只读方式逐行读取 sheet1，内存占用只与保留的行数有关，不需要载入整个总帐。
+    """
+    accounts = {str(account) for account in accounts}
+    try:
+        kept = _filter_gl_rows(iter_sheet_rows(file_path, sheet_name='sheet1', min_row=2), accounts)
+    except (KeyError, zipfile.BadZipFile, ET.ParseError):
+        # 非标准结构的文件交给 openpyxl 只读模式处理
+        kept = _filter_gl_rows(iter_sheet_rows(file_path, sheet_name='sheet1', min_row=2, backend='openpyxl'), accounts)
+    if not kept:
+        return None
+
+    cleaned_df = pd.DataFrame(kept, columns=['Account', *GL_COLUMNS.values()])
+    cleaned_df['Date'] = pd.to_datetime(cleaned_df['Date']).dt.date
+    return cleaned_df
+
+def clean_gl_data(file_path, account=GL_ACCOUNT):
+    gl_data = read_gl_accounts(file_path, [account])
+    return gl_data.drop(columns='Account') if gl_data is not None else None
+
+def partition_by_account(gl_data, accounts):
+    """按科目一次分组，返回 {科目: 总帐行}，没有数据的科目为空表"""
+    parts = {account: part.drop(columns='Account').reset_index(drop=True)
+             for account, part in gl_data.groupby('Account', sort=False)}
+    empty = gl_data.drop(columns='Account').iloc[:0]
+    return {account: parts.get(account, empty) for account in accounts}
+
+DEFAULT_PAYEE_NAME = "海南空港开发产业集团有限公司琼中福朋喜来登酒店分公司"
+
+def normalize_bank_statement(df):
+    """按列整理银行流水，生成 日期/对方户名/用途/交易金额/借方/贷方/交易流水号 六列"""
+    def column(name, default):
+        return df[name] if name in df.columns else pd.Series(default, index=df.index, dtype=object)
+
+    # 日期：YYYYMMDD 转为 YYYY-MM-DD，无法解析的保留原值
+    raw_dates = column('交易日期[ Transaction Date ]', '')
+    parsed_dates = pd.to_datetime(raw_dates.astype(str), format='%Y%m%d', errors='coerce')
+    transaction_dates = parsed_dates.dt.strftime('%Y-%m-%d').astype(object).where(parsed_dates.notna(), raw_dates)
+
+    # 收款人名称为空时使用默认户名
+    payee_names = column('收款人名称[ Payee\'s Name ]', np.nan)
+    blank_payee = payee_names.isna() | (payee_names.astype(str).str.strip() == '')
+    payee_names = payee_names.astype(object).where(~blank_payee, DEFAULT_PAYEE_NAME)
+
+    trade_amounts = column('交易金额[ Trade Amount ]', 0.0).astype(float)
+    debit_credit = np.select([trade_amounts > 0, trade_amounts < 0], ["收款", "付款"], default="")
+
+    return pd.DataFrame({
+        '日期': transaction_dates,
+        '对方户名': payee_names,
+        '用途': column('用途[ Purpose ]', ''),
+        '交易金额': trade_amounts,
+        '借方/贷方': debit_credit,
+        '交易流水号': column('交易流水号[ Transaction reference number ]', '').astype(str)
+    }).reset_index(drop=True)
 
-def main():
-    gl_files = glob.glob('gl*.xlsx')
-    bank_files = glob.glob('bank*.xls')
-    combined_file_path = 'Combined_Data.xlsx'
-
-    with pd.ExcelWriter(combined_file_path, engine='openpyxl') as writer:
-        if gl_files:
-            gl_data = clean_gl_data(gl_files[0])
-            if gl_data is not None and not gl_data.empty:
-                gl_data.to_excel(writer, sheet_name='GL Data', index=False)
-        
-        if bank_files:
-            bank_data = process_bank_data(bank_files[0])
-            if not bank_data.empty:
-                bank_data.to_excel(writer, sheet_name='Bank Data', index=False)
-    
-    print(f"所有数据已成功合并到 {combined_file_path}")
+def process_bank_data(file_path):
+    df = read_sheet(file_path, skiprows=8)
+    return normalize_bank_statement(df)
 
-if __name__ == "__main__":
-    main()
+GREEN_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+GREEN_FONT = Font(color="006100")
 
-# 添加5秒延迟
-time.sleep(5)
-
-# 第二段代码开始
-file_path = 'Combined_Data.xlsx'
-gl_data = pd.read_excel(file_path, sheet_name='GL Data')
-bank_data = pd.read_excel(file_path, sheet_name='Bank Data')
-
-gl_data['Base Amount'] = pd.to_numeric(gl_data['Base Amount'], errors='coerce')
-bank_data['交易金额'] = pd.to_numeric(bank_data['交易金额'], errors='coerce')
-
-matches = []
-unmatched_gl = []
-unmatched_bank = []
-
-bank_data_index_matched = set()
-gl_data_index_matched = set()
-
-for index_bank, row_bank in bank_data.iterrows():
-    match = gl_data[(abs(gl_data['Base Amount']) == abs(row_bank['交易金额'])) & 
-                    (((row_bank['交易金额'] < 0) & (gl_data['Base Amount'] < 0)) | 
-                     ((row_bank['交易金额'] > 0) & (gl_data['Base Amount'] > 0)))]
-    
-    if not match.empty:
-        for index_gl, row_gl in match.iterrows():
-            formatted_date = row_gl['Date'].strftime('%Y-%m-%d') if not pd.isna(row_gl['Date']) else ''
-            
-            matches.append({
-                '日期': row_bank['日期'],
-                '对方户名': row_bank['对方户名'],
-                '用途': row_bank['用途'],
-                '交易流水号': str(row_bank['交易流水号']),
-                '借方/贷方': row_bank['借方/贷方'],
-                '交易金额': row_bank['交易金额'],
-                '与总帐核对': row_gl['Reference'],
-                ' ': '',  
-                'Check with Bank': str(row_bank['交易流水号']),
-                'Trans Date': formatted_date,
-                'Description': row_gl['Description'],
-                'Base Amount': row_gl['Base Amount'],
-            })
-            bank_data_index_matched.add(index_bank)
-            gl_data_index_matched.add(index_gl)
-            break  
-
-for index_gl, row_gl in gl_data.iterrows():
-    if index_gl not in gl_data_index_matched:
-        unmatched_gl.append({
-            'Trans Date': row_gl['Date'].strftime('%Y-%m-%d') if not pd.isna(row_gl['Date']) else '',
-            'Description': row_gl['Description'],
-            'Base Amount': row_gl['Base Amount'],
-            'Reference': row_gl['Reference']
-        })
-
-for index_bank, row_bank in bank_data.iterrows():
-    if index_bank not in bank_data_index_matched:
-        unmatched_bank.append({
-            '日期': row_bank['日期'],
-            '对方户名': row_bank['对方户名'],
-            '用途': row_bank['用途'],
-            '借方/贷方': row_bank['借方/贷方'],
-            '交易金额': row_bank['交易金额'],
-            '交易流水号': str(row_bank['交易流水号'])
-        })
-
-verify_data = pd.DataFrame(matches)
-
-unmatched_gl_df = pd.DataFrame(unmatched_gl)
-unmatched_bank_df = pd.DataFrame(unmatched_bank)
-
-with pd.ExcelWriter(file_path, mode='a', engine='openpyxl', if_sheet_exists='replace') as writer:
-    verify_data.to_excel(writer, sheet_name='Bank_OK', index=False)
-    unmatched_bank_df.to_excel(writer, sheet_name='Unmatched_Bank_Data', index=False)
-    unmatched_gl_df.to_excel(writer, sheet_name='Unmatched_GL_Data', index=False)
-    
-
-wb = load_workbook(file_path)
-
-green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-green_font = Font(color="006100")
-
-ws_verify = wb['Bank_OK']
-
-ws_verify.insert_rows(1)
-ws_verify.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(verify_data.columns))
-ws_verify['A1'] = "银行 核对已成功 明细"
-ws_verify['A1'].font = green_font
-ws_verify['A1'].fill = green_fill
-
-yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-yellow_font = Font(color="000000")  
-
-ws_unmatched_gl = wb['Unmatched_GL_Data']
-ws_unmatched_gl.insert_rows(1)
-ws_unmatched_gl.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(unmatched_gl_df.columns))
-ws_unmatched_gl['A1'] = "未匹配GL_DATA"
-ws_unmatched_gl['A1'].font = yellow_font
-ws_unmatched_gl['A1'].fill = yellow_fill
-
-ws_unmatched_bank = wb['Unmatched_Bank_Data']
-ws_unmatched_bank.insert_rows(1)
-ws_unmatched_bank.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(unmatched_bank_df.columns))
-ws_unmatched_bank['A1'] = "未匹配BANK_DATA"
-ws_unmatched_bank['A1'].font = yellow_font
-ws_unmatched_bank['A1'].fill = yellow_fill
-
-def unmerge_header(worksheet):
-    merged_ranges = worksheet.merged_cells.ranges.copy()
-    for merged_range in merged_ranges:
-        worksheet.unmerge_cells(str(merged_range))
-
-unmerge_header(ws_verify)
-unmerge_header(ws_unmatched_gl)
-unmerge_header(ws_unmatched_bank)
-
-def adjust_columns_and_alignment(worksheet, column_widths):
-    for col_letter, width_info in column_widths.items():
-        width, alignment_str = width_info
-        worksheet.column_dimensions[col_letter].width = width
-        
-        alignment = None
-        if alignment_str == 'center':
-            alignment = Alignment(horizontal='center')
-        elif alignment_str == 'left':
-            alignment = Alignment(horizontal='left')
-        elif alignment_str == 'right':
-            alignment = Alignment(horizontal='right')
-        
-        for cell in worksheet[col_letter]:
-            cell.alignment = alignment
+YELLOW_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+YELLOW_FONT = Font(color="000000")
 
 column_widths = {
     'A': (22.92, 'center'),     
@@ -226,18 +161,6 @@ column_widths = {
     'L': (13.46, 'right')      
 }
 
-adjust_columns_and_alignment(ws_verify, column_widths)
-adjust_columns_and_alignment(ws_unmatched_gl, column_widths)
-adjust_columns_and_alignment(ws_unmatched_bank, column_widths)
-
-def set_header_style(worksheet, header_styles, header_row=2):
-    for col_letter, style_info in header_styles.items():
-        background_color, font_color, font_name, font_size = style_info
-        cell = worksheet[f'{col_letter}{header_row}']
-        cell.fill = PatternFill(start_color=background_color, end_color=background_color, fill_type="solid")
-        cell.font = Font(color=font_color, name=font_name, size=font_size, bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
 header_styles_verify = {
     'A': ('00009B', 'FFFFFF', '微软雅黑', 10),   
     'B': ('00009B', 'FFFFFF', '微软雅黑', 10),   
@@ -253,17 +176,6 @@ header_styles_verify = {
     'L': ('333F4F', 'FFFFFF', '微软雅黑', 10),   
 }
 
-set_header_style(ws_verify, header_styles_verify)
-
-def set_data_style(worksheet, data_styles, start_row=3):
-    for row in worksheet.iter_rows(min_row=start_row):
-        for cell in row:
-            col_letter = cell.column_letter
-            if col_letter in data_styles:
-                background_color, font_color, font_name, font_size = data_styles[col_letter]
-                cell.fill = PatternFill(start_color=background_color, end_color=background_color, fill_type="solid")
-                cell.font = Font(color=font_color, name=font_name, size=font_size)
-
 data_styles_verify = {
     'A': ('FFFFFFFF', '002060', '微软雅黑', 10),  
     'B': ('FFFFFFFF', '002060', '微软雅黑', 10),  
@@ -279,8 +191,6 @@ data_styles_verify = {
     'L': ('FFFFFFFF', '000000', '微软雅黑', 10),  
 }
 
-set_data_style(ws_verify, data_styles_verify)
-
 header_styles_unmatched_gl = {
     'A': ('333F4F', 'FFFFFF', '微软雅黑', 10),   
     'B': ('333F4F', 'FFFFFF', '微软雅黑', 10),   
@@ -288,8 +198,6 @@ header_styles_unmatched_gl = {
     'D': ('333F4F', 'FFFFFF', '微软雅黑', 10),   
 }
 
-set_header_style(ws_unmatched_gl, header_styles_unmatched_gl)
-
 data_styles_unmatched_gl = {
     'A': ('FFFFFFFF', '002060', '微软雅黑', 10),  
     'B': ('FFFFFFFF', '002060', '微软雅黑', 10),  
@@ -297,8 +205,6 @@ data_styles_unmatched_gl = {
     'D': ('FFFFFFFF', '002060', '微软雅黑', 10),  
 }
 
-set_data_style(ws_unmatched_gl, data_styles_unmatched_gl)
-
 header_styles_unmatched_bank = {
     'A': ('333F4F', 'FFFFFF', '微软雅黑', 10),   
     'B': ('333F4F', 'FFFFFF', '微软雅黑', 10),   
@@ -308,8 +214,6 @@ header_styles_unmatched_bank = {
     'F': ('333F4F', 'FFFFFF', '微软雅黑', 10),   
 }
 
-set_header_style(ws_unmatched_bank, header_styles_unmatched_bank)
-
 data_styles_unmatched_bank = {
     'A': ('FFFFFFFF', '002060', '微软雅黑', 10),  
     'B': ('FFFFFFFF', '002060', '微软雅黑', 10),  
@@ -319,23 +223,253 @@ data_styles_unmatched_bank = {
     'F': ('FFFFFFFF', '002060', '微软雅黑', 10),  
 }
 
-set_data_style(ws_unmatched_bank, data_styles_unmatched_bank)
+header_styles_group = {
+    'A': ('00009B', 'FFFFFF', '微软雅黑', 10),   
+    'B': ('00009B', 'FFFFFF', '微软雅黑', 10),   
+    'C': ('00009B', 'FFFFFF', '微软雅黑', 10),   
+    'D': ('00009B', 'FFFFFF', '微软雅黑', 10),   
+    'E': ('00009B', 'FFFFFF', '微软雅黑', 10),   
+    'F': ('00009B', 'FFFFFF', '微软雅黑', 10),   
+    'G': ('00009B', 'FFFFFF', '微软雅黑', 10),   
+}
 
-ws_verify.freeze_panes = ws_verify['A3']
-ws_unmatched_gl.freeze_panes = ws_unmatched_gl['A3']
-ws_unmatched_bank.freeze_panes = ws_unmatched_bank['A3']
+data_styles_group = {
+    'A': ('FFFFFFFF', '002060', '微软雅黑', 10),  
+    'B': ('FFFFFFFF', '002060', '微软雅黑', 10),  
+    'C': ('FFFFFFFF', '002060', '微软雅黑', 10),  
+    'D': ('FFFFFFFF', '002060', '微软雅黑', 10),  
+    'E': ('FFFFFFFF', '002060', '微软雅黑', 10),  
+    'F': ('FFFFFFFF', '002060', '微软雅黑', 10),  
+    'G': ('FFFFFFFF', '002060', '微软雅黑', 10),  
+}
 
-if 'GL Data' in wb.sheetnames:
-    ws_gl_data = wb['GL Data']
-    ws_gl_data.sheet_state = 'hidden'
+# 各结果表的版式：(工作表, 标题, 标题样式, 表头样式, 数据样式)，列宽和对齐方式共用 column_widths
+RESULT_SHEETS = [
+    ('Bank_OK', "银行 核对已成功 明细", 'green', header_styles_verify, data_styles_verify),
+    ('Group_Matched', "银行 拆分/合并付款 核对明细", 'green', header_styles_group, data_styles_group),
+    ('Unmatched_Bank_Data', "未匹配BANK_DATA", 'yellow', header_styles_unmatched_bank, data_styles_unmatched_bank),
+    ('Unmatched_GL_Data', "未匹配GL_DATA", 'yellow', header_styles_unmatched_gl, data_styles_unmatched_gl),
+]
+
+NO_BORDER = Border(left=Side(), right=Side(), top=Side(), bottom=Side(), diagonal=Side())
+
+class SheetStyles:
+    """按样式内容注册命名样式，同样式的单元格共用一个命名样式，每个工作簿只注册一次"""
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.names = {}
+
+    def _register(self, key, **attributes):
+        name = self.names.get(key)
+        if name is None:
+            name = f"bank_{key[0]}_{len(self.names)}"
+            attributes.setdefault('border', NO_BORDER)
+            self.workbook.add_named_style(NamedStyle(name=name, **attributes))
+            self.names[key] = name
+        return name
+
+    def title(self, color, horizontal):
+        font, fill = (GREEN_FONT, GREEN_FILL) if color == 'green' else (YELLOW_FONT, YELLOW_FILL)
+        return self._register(('title', color, horizontal), font=font, fill=fill,
+                              alignment=Alignment(horizontal=horizontal))
+
+    def header(self, style_info):
+        background_color, font_color, font_name, font_size = style_info
+        return self._register(('header', *style_info), alignment=Alignment(horizontal='center'),
+                              fill=PatternFill(start_color=background_color, end_color=background_color, fill_type="solid"),
+                              font=Font(color=font_color, name=font_name, size=font_size, bold=True))
 
-if 'Bank Data' in wb.sheetnames:
-    ws_bank_data = wb['Bank Data']
-    ws_bank_data.sheet_state = 'hidden'
+    def data(self, style_info, horizontal):
+        background_color, font_color, font_name, font_size = style_info
+        return self._register(('data', *style_info, horizontal), alignment=Alignment(horizontal=horizontal),
+                              fill=PatternFill(start_color=background_color, end_color=background_color, fill_type="solid"),
+                              font=Font(color=font_color, name=font_name, size=font_size))
+
+def _cell_value(value):
+    # NaN / NaT 写为空单元格
+    return None if value is pd.NaT or (isinstance(value, float) and value != value) else value
+
+def _styled_cells(worksheet, values, styles):
+    cells = []
+    for value, style in zip(values, styles):
+        cell = WriteOnlyCell(worksheet, value=_cell_value(value))
+        if style is not None:
+            cell.style = style
+        cells.append(cell)
+    return cells
+
+def write_data_sheet(workbook, sheet_name, df, hidden=False):
+    """原始数据表，不设样式"""
+    worksheet = workbook.create_sheet(sheet_name)
+    if hidden:
+        worksheet.sheet_state = 'hidden'
+    worksheet.append([str(column) for column in df.columns])
+    for values in df.itertuples(index=False, name=None):
+        worksheet.append([_cell_value(value) for value in values])
+
+def write_result_sheet(workbook, styles, sheet_name, df, title, title_color, header_styles, data_styles):
+    """结果表：第一行标题，第二行表头，其后为数据；列宽、对齐和样式在写入前按列确定"""
+    worksheet = workbook.create_sheet(sheet_name)
+
+    # 列宽和冻结窗格必须在写入数据前设置
+    for col_letter, (width, _) in column_widths.items():
+        worksheet.column_dimensions[col_letter].width = width
+    worksheet.freeze_panes = 'A3'
+
+    letters = [get_column_letter(index) for index in range(1, len(df.columns) + 1)]
+    alignments = [column_widths[letter][1] if letter in column_widths else None for letter in letters]
+    header_row_styles = [styles.header(header_styles[letter]) if letter in header_styles else None for letter in letters]
+    data_row_styles = [styles.data(data_styles[letter], alignment) if letter in data_styles else None
+                       for letter, alignment in zip(letters, alignments)]
+
+    worksheet.append(_styled_cells(worksheet, [title], [styles.title(title_color, alignments[0] if alignments else None)]))
+    worksheet.append(_styled_cells(worksheet, [str(column) for column in df.columns], header_row_styles))
+    for values in df.itertuples(index=False, name=None):
+        worksheet.append(_styled_cells(worksheet, values, data_row_styles))
+
+def write_reconciliation(file_path, gl_data, bank_data, verify_data, unmatched_bank_df, unmatched_gl_df,
+                         group_matched_df=None):
+    """以只写模式一次写出原始数据和匹配结果，样式在写入时设置"""
+    workbook = Workbook(write_only=True)
+    styles = SheetStyles(workbook)
+
+    write_data_sheet(workbook, 'GL Data', gl_data, hidden=True)
+    write_data_sheet(workbook, 'Bank Data', bank_data, hidden=True)
+
+    frames = {
+        'Bank_OK': verify_data,
+        'Group_Matched': group_matched_df,
+        'Unmatched_Bank_Data': unmatched_bank_df,
+        'Unmatched_GL_Data': unmatched_gl_df,
+    }
+    for sheet_name, title, title_color, header_styles, data_styles in RESULT_SHEETS:
+        if frames[sheet_name] is not None:
+            write_result_sheet(workbook, styles, sheet_name, frames[sheet_name], title, title_color,
+                               header_styles, data_styles)
+
+    workbook.save(file_path)
+
+def load_account_map(path=ACCOUNT_MAP_FILE):
+    """返回 {科目: [银行流水文件模式]}，配置文件不存在时为 {115307: ['bank*.xls']}"""
+    if not os.path.exists(path):
+        return {GL_ACCOUNT: ['bank*.xls']}
+    with open(path, encoding='utf-8') as f:
+        mapping = json.load(f)
+    return {str(account): [patterns] if isinstance(patterns, str) else list(patterns)
+            for account, patterns in mapping.items()}
+
+def read_bank_files(patterns):
+    """读取匹配各模式的所有银行流水文件并合并，没有文件时返回 None"""
+    bank_files = sorted({file for pattern in patterns for file in glob.glob(pattern)})
+    # 源文件内容未变时直接使用上次解析的结果
+    frames = [cached_frame('bank', file, process_bank_data) for file in bank_files]
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+def read_gl_files(gl_files, accounts):
+    """一次读取所有总帐文件中各科目的行"""
+    accounts = sorted(accounts)
+    frames = [cached_frame('gl_accounts', file, lambda path: read_gl_accounts(path, accounts), *accounts)
+              for file in sorted(gl_files)]
+    frames = [frame for frame in frames if frame is not None]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+def reconcile_account(bank_data, gl_data, timer=None):
+    """单个科目的匹配（可在子进程中运行），返回 (一对一匹配, 拆分匹配, 结果表)"""
+    # 默认按整数分金额顺序认领，每条银行流水只认领一条未使用的 GL 行（同金额时取最先出现的一条）；
+    # window 模式下在容差和日期窗口内取日期最近的一条
+    # 剩余的行再做一对多 / 多对一匹配，结果写入 Group_Matched
+    pairs, groups = match_all(bank_data, gl_data, mode=MATCH_MODE, tolerance=MATCH_TOLERANCE,
+                              window_days=MATCH_WINDOW_DAYS, group_pass=GROUP_MATCH, group_any_party=GROUP_ANY_PARTY,
+                              timer=timer)
+    return pairs, groups, build_results(bank_data, gl_data, pairs, groups, timer=timer)
+
+def output_path(account, account_count):
+    return 'Combined_Data.xlsx' if account_count == 1 else f'Combined_Data_{account}.xlsx'
 
-wb.save(file_path)
+def main():
+    account_map = load_account_map()
+    gl_files = glob.glob('gl*.xlsx')
+    timer = StageTimer('bank_reconciliation')
+
+    with timer.stage('读取总帐'):
+        gl_all = read_gl_files(gl_files, account_map) if gl_files else None
+    if gl_all is None or gl_all.empty:
+        print(f"未找到科目 {', '.join(account_map)} 的总帐数据，请检查 gl*.xlsx 文件")
+        return
+    gl_all['Base Amount'] = pd.to_numeric(gl_all['Base Amount'], errors='coerce')
+    gl_by_account = partition_by_account(gl_all, account_map)
+
+    accounts = {}
+    with timer.stage('读取银行流水'):
+        for account, patterns in account_map.items():
+            bank_data = read_bank_files(patterns)
+            if bank_data is None:
+                print(f"科目 {account}：未找到银行流水数据，请检查 {', '.join(patterns)} 文件")
+                continue
+            if gl_by_account[account].empty:
+                print(f"科目 {account}：未找到总帐数据，跳过")
+                continue
+            bank_data['交易金额'] = pd.to_numeric(bank_data['交易金额'], errors='coerce')
+            accounts[account] = (bank_data, gl_by_account[account])
+    if not accounts:
+        return
+
+    ledgers, ledger_keys = {}, {}
+    matched = 0
+    try:
+        # 跳过台帐中已核销的行，并结转上次的未达项
+        if LEDGER_PATH != '0':
+            with timer.stage('台帐'):
+                for account, (bank_data, gl_data) in accounts.items():
+                    ledgers[account] = ReconciliationLedger(LEDGER_PATH, account)
+                    bank_data, gl_data, bank_keys, gl_keys, ledger_stats = ledgers[account].prepare(bank_data, gl_data)
+                    accounts[account] = (bank_data, gl_data)
+                    ledger_keys[account] = (bank_keys, gl_keys)
+                    print(f"科目 {account} 台帐：跳过已核销 银行 {ledger_stats['bank_skipped']} 条 / 总帐 {ledger_stats['gl_skipped']} 条，"
+                          f"结转未达项 银行 {ledger_stats['bank_carried']} 条 / 总帐 {ledger_stats['gl_carried']} 条")
+
+        workers = MATCH_WORKERS or max(1, min(len(accounts), os.cpu_count() or 1))
+        if workers > 1 and len(accounts) > 1:
+            # 各科目互不相关，在子进程中并行匹配
+            with timer.stage('匹配'):
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = {account: executor.submit(reconcile_account, bank_data, gl_data)
+                               for account, (bank_data, gl_data) in accounts.items()}
+                    results = {account: future.result() for account, future in futures.items()}
+        else:
+            results = {account: reconcile_account(bank_data, gl_data, timer)
+                       for account, (bank_data, gl_data) in accounts.items()}
+
+        for account, (bank_data, gl_data) in accounts.items():
+            pairs, groups, (verify_data, unmatched_bank_df, unmatched_gl_df, group_matched_df) = results[account]
+            file_path = output_path(account, len(account_map))
+            with timer.stage('写入'):
+                write_reconciliation(file_path, gl_data, bank_data, verify_data, unmatched_bank_df, unmatched_gl_df,
+                                     group_matched_df if GROUP_MATCH else None)
+
+            # 结果表写出后再记入台帐，写入失败时下次仍会重新匹配
+            if account in ledgers:
+                with timer.stage('台帐'):
+                    ledgers[account].record(bank_data, gl_data, *ledger_keys[account], pairs, groups)
+            matched += len(verify_data)
+
+            print(f"科目 {account}：所有数据已成功合并到 {file_path}")
+            print(f"  一对一匹配 {len(verify_data)} 条，未匹配 银行 {len(unmatched_bank_df)} 条 / 总帐 {len(unmatched_gl_df)} 条")
+            if GROUP_MATCH:
+                print(f"  拆分/合并付款匹配 {group_matched_df['组号'].nunique()} 组，已写入 'Group_Matched'")
+    finally:
+        # 匹配或写入出错时也要关闭台帐连接
+        for ledger in ledgers.values():
+            ledger.close()
+
+    timer.write_report(accounts=list(accounts), gl_rows=sum(len(gl) for _, gl in accounts.values()),
+                       bank_rows=sum(len(bank) for bank, _ in accounts.values()), matched=matched)
+    print("The 'GL Data' and 'Bank Data' sheets have been hidden.")
+    print("Unmatched GL Data and Bank Data have been written to separate sheets named 'Unmatched_GL_Data' and 'Unmatched_Bank_Data'.")
+    print(timer.summary())
 
-print("The 'GL Data' and 'Bank Data' sheets have been hidden.")
-print("Verification completed and sorted by date in descending order. A green title has been added above the headers of the new 'Verify' sheet.")
-print("Unmatched GL Data and Bank Data have been written to separate sheets named 'Unmatched_GL_Data' and 'Unmatched_Bank_Data'.")
-print("Yellow titles have been added at the top of each unmatched data sheet indicating '未匹配GL_DATA' or '未匹配BANK_DATA'.")
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,256 @@
+import numbers
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+from excel_reader import read_sheet
+from parse_cache import load_cached, store_cached
+
+# 帐龄报表中需要转换为数值的列
+NUMERIC_COLUMNS = ['Total', '30 days', '60 days', '90 days', '120 days', '150 days', '180 days']
+
+# 供应商标题行拆分出来的两列
+SUPPLIER_COLS = ['Supplier ID', 'Supplier Name']
+
+# 按供应商和月份汇总的分组列
+AGGREGATE_KEYS = ['Supplier ID', 'Supplier Name', 'YearMonth']
+
+# 需要处理的工作表名称
+SHEETS_TO_PROCESS = ['Aged Reports']
+
+# 合法的单据号：只包含字母、数字和连字符，其它内容视为供应商名称
+REFERENCE_PATTERN = re.compile(r'^[A-Za-z0-9\-]*$')
+
+
+def classify_supplier_headers(df):
+    """把供应商标题行的 Transaction Date / Transaction Reference 移到 Supplier ID / Supplier Name 列（按列批量处理）"""
+    df = df.copy()
+
+    # 检查'Transaction Date'列，整列解析日期，无法解析的非空内容即为供应商编号
+    if 'Transaction Date' in df.columns:
+        raw_dates = df['Transaction Date']
+        parsed_dates = pd.to_datetime(raw_dates, errors='coerce', format='mixed')
+        header_mask = raw_dates.notna() & parsed_dates.isna()
+
+        if 'Supplier ID' in df.columns:
+            df['Supplier ID'] = df['Supplier ID'].where(~header_mask, raw_dates)
+        else:
+            df['Supplier ID'] = raw_dates.where(header_mask)
+        # 只保留年月日
+        df['Transaction Date'] = parsed_dates.dt.normalize()
+
+    # 检查'Transaction Reference'列，不符合单据号格式的内容即为供应商名称
+    if 'Transaction Reference' in df.columns:
+        raw_refs = df['Transaction Reference']
+        # 与逐行 str(value) 保持一致：空值按 'nan' 处理，视为合法单据号
+        name_mask = ~raw_refs.astype(str).str.fullmatch(REFERENCE_PATTERN, na=True).astype(bool)
+
+        if 'Supplier Name' in df.columns:
+            df['Supplier Name'] = df['Supplier Name'].where(~name_mask, raw_refs)
+        else:
+            df['Supplier Name'] = raw_refs.where(name_mask)
+        df['Transaction Reference'] = raw_refs.where(~name_mask)
+
+    return df
+
+
+def clean_aged_sheet(df):
+    """清理单个 Aged Reports 工作表：数值列转换、删除 Total 行、拆分供应商标题行"""
+    # 确保数值列的类型是float
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors='coerce')
+
+    # 查找并删除包含'Total'的行，这里使用'Transaction Date'和'Transaction Reference'列来查找
+    if 'Transaction Date' in df.columns and 'Transaction Reference' in df.columns:
+        date_total = df['Transaction Date'].astype(str).str.lower().str.contains('total', na=False)
+        ref_total = df['Transaction Reference'].astype(str).str.lower().str.contains('total', na=False)
+        df = df[~date_total & ~ref_total]
+
+    return classify_supplier_headers(df)
+
+
+def fill_supplier_columns(df):
+    """自动向下填充空白格，直到遇到新的Supplier ID和Supplier Name"""
+    df[SUPPLIER_COLS] = df[SUPPLIER_COLS].ffill()
+    return df
+
+
+def read_aged_report(file_path, sheets_to_process=SHEETS_TO_PROCESS):
+    """读取并清理单个帐龄报表文件，供应商只在本文件内向下填充（可在子进程中执行）"""
+    # 读取每个工作表的数据，跳过前两行
+    frames = [clean_aged_sheet(read_sheet(file_path, sheet_name=sheet_name, skiprows=2))
+              for sheet_name in sheets_to_process]
+    return fill_supplier_columns(pd.concat(frames, ignore_index=True))
+
+
+def default_workers(task_count):
+    """并行进程数：不超过 CPU 核数和文件数"""
+    return max(1, min(task_count, os.cpu_count() or 1))
+
+
+def aggregate_aged_report(file_path):
+    """读取单个帐龄报表并按供应商和月份汇总（可在子进程中执行），Rows 为参与汇总的明细行数"""
+    df = add_year_month(read_aged_report(file_path))
+    grouped = df.groupby(AGGREGATE_KEYS).agg(
+        Total_Transactions=('Total', 'sum'),
+        Rows=('Total', 'size'),
+    ).reset_index()
+    grouped['YearMonth'] = grouped['YearMonth'].astype(str)
+    return grouped
+
+
+def ingest_monthly_aggregates(file_paths, workers=None):
+    """按文件汇总后合并：内容未变的文件直接使用缓存的月度汇总，不再读取和清理明细
+
+    增量的粒度是文件而不是月份：帐龄报表按供应商排列、每月都包含全部历史，
+    文件有任何变化都要整表解析，解析之后的汇总耗时可以忽略，因此变化的文件整体重新汇总。
+    返回 (汇总结果, 明细行数, 使用缓存的文件数)。
+    """
+    file_paths = list(file_paths)
+    frames = [load_cached('aged_monthly', file_path) for file_path in file_paths]
+    missing = [index for index, frame in enumerate(frames) if frame is None]
+
+    if missing:
+        missing_paths = [file_paths[index] for index in missing]
+        if workers is None:
+            workers = default_workers(len(missing_paths))
+        if workers > 1 and len(missing_paths) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(aggregate_aged_report, missing_paths))
+        else:
+            results = [aggregate_aged_report(file_path) for file_path in missing_paths]
+        for index, file_path, frame in zip(missing, missing_paths, results):
+            store_cached('aged_monthly', file_path, frame)
+            frames[index] = frame
+
+    combined = pd.concat(frames, ignore_index=True)
+    # 同一供应商同一月份可能分布在多个文件中，再合计一次
+    grouped = combined.groupby(AGGREGATE_KEYS, sort=True).agg(
+        Total_Transactions=('Total_Transactions', 'sum'),
+    ).reset_index()
+    return grouped, int(combined['Rows'].sum()), len(file_paths) - len(missing)
+
+
+def add_year_month(final_df):
+    """Transaction Date 转为日期，增加按月汇总用的 YearMonth 列"""
+    final_df['Transaction Date'] = pd.to_datetime(final_df['Transaction Date'], errors='coerce')
+    final_df['YearMonth'] = final_df['Transaction Date'].dt.to_period('M')
+    return final_df
+
+
+def pivot_by_month(grouped):
+    """按月汇总结果转为透视表：供应商为索引，月份从新到旧排列，列名为 'YYYY-MM'，没有发生额为 0"""
+    pivot_table = grouped.pivot_table(index=['Supplier ID', 'Supplier Name'],
+                                      columns='YearMonth',
+                                      values='Total_Transactions',
+                                      aggfunc='sum',
+                                      fill_value=0)
+
+    # 月份按 Period 从新到旧排列，列名为 'YYYY-MM'
+    months = pd.PeriodIndex(pivot_table.columns, freq='M')
+    order = months.argsort()[::-1]
+    pivot_table = pivot_table.iloc[:, order]
+    pivot_table.columns = months[order].strftime('%Y-%m')
+    return pivot_table
+
+
+def build_aging_table(pivot_table):
+    """透视表（见 pivot_by_month）转为报表：供应商一行，Total_Sum 在供应商名称之后
+
+    报表全部为数值，0 由会计格式显示为 "-"。返回 (报表, 统计行, 最新月份)。
+    """
+    month_columns = list(pivot_table.columns)
+
+    # Total_Sum 放在各月之前（reset_index 返回新表，不修改传入的透视表）
+    result_df = pivot_table.reset_index()
+    result_df.insert(2, 'Total_Sum', pivot_table.sum(axis=1).to_numpy())
+    result_df.columns.name = None
+
+    # 统计行：各列合计
+    stats_row = {'Supplier ID': '总计', 'Supplier Name': ''}
+    stats_row.update(result_df[['Total_Sum'] + month_columns].sum().to_dict())
+
+    return result_df, stats_row, month_columns[0]
+
+
+# 会计专用格式，负数红色显示
+ACCOUNTING_FORMAT = '_ * #,##0.00_ ;[Red]_ * -#,##0.00_ ;_ * "-"??_ ;_ @_ '
+
+
+def _report_styles():
+    """帐龄报表使用的命名样式，每个工作簿只注册一次"""
+    right_alignment = Alignment(horizontal='right', vertical='center')
+    stats_fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
+    stats_font = Font(name='微软雅黑', size=9, bold=True, color='002060')
+    data_font = Font(name='微软雅黑', size=10)
+
+    return [
+        NamedStyle(name='aging_stats', font=stats_font, fill=stats_fill, alignment=right_alignment),
+        NamedStyle(name='aging_stats_number', font=stats_font, fill=stats_fill, alignment=right_alignment,
+                   number_format=ACCOUNTING_FORMAT),
+        NamedStyle(name='aging_header', alignment=right_alignment,
+                   font=Font(name='微软雅黑', size=9, bold=True, color='FFFFFF'),
+                   fill=PatternFill(start_color="002060", end_color="002060", fill_type="solid")),
+        NamedStyle(name='aging_data', font=data_font, alignment=right_alignment),
+        NamedStyle(name='aging_data_number', font=data_font, alignment=right_alignment,
+                   number_format=ACCOUNTING_FORMAT),
+    ]
+
+
+def _styled_row(worksheet, values, text_style, number_style=None):
+    """按值类型为一行数据套用样式，数值使用会计格式"""
+    cells = []
+    for value in values:
+        if value is not None and value != value:  # NaN 写为空单元格
+            value = None
+        cell = WriteOnlyCell(worksheet, value=value)
+        if number_style and isinstance(value, numbers.Number) and not isinstance(value, bool):
+            cell.style = number_style
+        else:
+            cell.style = text_style
+        cells.append(cell)
+    return cells
+
+
+def write_aging_report(output_file, result_df, stats_row, generated_at=None):
+    """以只写模式一次性写出帐龄报表：标题行、表头、统计行、数据行"""
+    generated_at = generated_at or datetime.now()
+
+    workbook = Workbook(write_only=True)
+    for style in _report_styles():
+        workbook.add_named_style(style)
+
+    worksheet = workbook.create_sheet('Aggregated Data')
+
+    # 列宽、行高、冻结窗格和网格线必须在写入数据前设置
+    columns = list(result_df.columns)
+    worksheet.column_dimensions['A'].width = 19
+    worksheet.column_dimensions['B'].width = 40
+    for idx in range(3, len(columns) + 1):
+        worksheet.column_dimensions[get_column_letter(idx)].width = 20
+    worksheet.sheet_format.defaultRowHeight = 22.5
+    worksheet.sheet_format.customHeight = True
+    worksheet.freeze_panes = 'A4'
+    worksheet.sheet_view.showGridLines = False
+
+    # 第一行：生成时间、标题，从第4列开始为 30Days、60Days...
+    title_values = [generated_at.strftime('%Y-%m-%d %H:%M:%S'), 'AP Aging Report by Suppliers', None]
+    title_values += [f"{days}Days" for days in range(30, 30 * (len(columns) - 2), 30)]
+    worksheet.append(_styled_row(worksheet, title_values[:max(len(columns), 3)], 'aging_stats'))
+
+    # 第二行：表头；第三行：统计行
+    worksheet.append(_styled_row(worksheet, columns, 'aging_header'))
+    worksheet.append(_styled_row(worksheet, [stats_row.get(col) for col in columns],
+                                 'aging_stats', 'aging_stats_number'))
+
+    # 数据行
+    for values in result_df.itertuples(index=False, name=None):
+        worksheet.append(_styled_row(worksheet, values, 'aging_data', 'aging_data_number'))
+
+    workbook.save(output_file)
@@ -0,0 +1,422 @@
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+from stage_timer import optional_stage
+
+
+def to_cents(amounts):
+    """把金额转换为整数分，无法转换的金额返回 None"""
+    cents = np.rint(pd.to_numeric(amounts, errors='coerce').to_numpy(dtype=float) * 100)
+    return [None if np.isnan(c) else int(c) for c in cents]
+
+
+def format_trans_date(dates):
+    """日期统一格式化为 YYYY-MM-DD，空日期输出空字符串"""
+    return pd.to_datetime(dates, errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+
+
+def build_gl_index(gl_data):
+    """按带符号的整数分金额建立 GL 索引，同一金额的多行按原顺序排队"""
+    gl_index = defaultdict(deque)
+    for position, cents in enumerate(to_cents(gl_data['Base Amount'])):
+        # 金额为0或为空的行不参与匹配
+        if cents:
+            gl_index[cents].append(position)
+    return gl_index
+
+
+def match_exact(bank_data, gl_data):
+    """银行流水逐行认领一条金额、方向相同且未被使用的 GL 行，返回 (银行行位置, GL行位置) 列表"""
+    gl_index = build_gl_index(gl_data)
+
+    pairs = []
+    for bank_position, cents in enumerate(to_cents(bank_data['交易金额'])):
+        if not cents:
+            continue
+        candidates = gl_index.get(cents)
+        if candidates:
+            pairs.append((bank_position, candidates.popleft()))
+    return pairs
+
+
+# 第二轮（一对多 / 多对一）匹配的参数：日期窗口（天）、每组最多条数、每次搜索的候选条数、
+# 总耗时上限（秒）、单个目标每组候选的搜索耗时上限（秒）
+GROUP_WINDOW_DAYS = 7
+GROUP_MAX_SIZE = 6
+GROUP_MAX_CANDIDATES = 30
+GROUP_TIME_BUDGET = 10.0
+GROUP_TARGET_BUDGET = 0.1
+
+# 没有日期的行排在所有日期之后，设置日期窗口时不会被匹配
+_UNDATED = 10 ** 9
+
+
+def to_day_numbers(dates):
+    """日期转换为天数（整数），空日期为 _UNDATED"""
+    parsed = pd.to_datetime(pd.Series(dates), errors='coerce')
+    days = (parsed - pd.Timestamp('1970-01-01')).dt.days
+    return days.fillna(_UNDATED).astype('int64').to_numpy()
+
+
+def build_gl_window_index(gl_data):
+    """按整数分金额分组，每组内按日期排序，返回 (有序金额数组, {金额: [日期列表, 位置列表]})"""
+    cents = to_cents(gl_data['Base Amount'])
+    days = to_day_numbers(gl_data['Date'])
+
+    groups = defaultdict(list)
+    for position, (amount, day) in enumerate(zip(cents, days)):
+        if amount:
+            groups[amount].append((int(day), position))
+
+    index = {}
+    for amount, entries in groups.items():
+        entries.sort()
+        index[amount] = [[day for day, _ in entries], [position for _, position in entries]]
+    return np.array(sorted(index), dtype=np.int64), index
+
+
+def _nearest(dates, day):
+    """有序日期列表中离 day 最近的一项，返回 (日期差, 下标)"""
+    i = bisect_left(dates, day)
+    best = None
+    for j in (i - 1, i):
+        if 0 <= j < len(dates):
+            distance = abs(dates[j] - day)
+            if best is None or distance < best[0]:
+                best = (distance, j)
+    return best
+
+
+def match_window(bank_data, gl_data, tolerance=0.0, window_days=None):
+    """按金额容差和日期窗口匹配：每条银行流水在方向相同、金额相差不超过 tolerance（元）、
+    日期相差不超过 window_days 天的未使用 GL 行中，选日期最近的一条（其次金额最接近）
+
+    window_days 为 None 时不限制日期，只用日期远近挑选同金额的 GL 行。
+    """
+    tolerance_cents = int(round(tolerance * 100))
+    amounts, index = build_gl_window_index(gl_data)
+    bank_days = to_day_numbers(bank_data['日期'])
+
+    pairs = []
+    for bank_position, cents in enumerate(to_cents(bank_data['交易金额'])):
+        if not cents:
+            continue
+        day = int(bank_days[bank_position])
+
+        # 金额在容差范围内、方向相同的 GL 分组（容差不跨过 0）
+        low, high = cents - tolerance_cents, cents + tolerance_cents
+        if cents > 0:
+            low = max(low, 1)
+        else:
+            high = min(high, -1)
+        lo = np.searchsorted(amounts, low, side='left')
+        hi = np.searchsorted(amounts, high, side='right')
+
+        best = None
+        for amount in amounts[lo:hi]:
+            dates, positions = index[int(amount)]
+            if not dates:
+                continue
+            distance, j = _nearest(dates, day)
+            if window_days is not None and distance > window_days:
+                continue
+            key = (distance, abs(int(amount) - cents), positions[j])
+            if best is None or key < best[0]:
+                best = (key, int(amount), j)
+
+        if best is not None:
+            _, amount, j = best
+            dates, positions = index[amount]
+            pairs.append((bank_position, positions[j]))
+            del dates[j]
+            del positions[j]
+    return pairs
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def find_subset(target, values, max_size, deadline):
+    """在 values（正整数分，从大到小排列）中找出和恰好为 target 的若干项，返回下标元组，找不到返回 None
+
+    带剪枝（剩余项之和不足时停止）和失败记忆，超过 deadline 时抛出 _BudgetExceeded。
+    """
+    n = len(values)
+    suffix = [0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + values[i]
+
+    failed = set()
+
+    def search(start, remaining, size):
+        if remaining == 0:
+            return ()
+        if size == max_size or suffix[start] < remaining:
+            return None
+        key = (start, remaining, size)
+        if key in failed:
+            return None
+        if time.perf_counter() > deadline:
+            raise _BudgetExceeded
+
+        for i in range(start, n):
+            if suffix[i] < remaining:
+                break
+            value = values[i]
+            if value > remaining:
+                continue
+            found = search(i + 1, remaining - value, size + 1)
+            if found is not None:
+                return (i,) + found
+
+        failed.add(key)
+        return None
+
+    return search(0, target, 0)
+
+
+class _WindowPool:
+    """未匹配行按日期排序，便于取出日期窗口内、同方向且未使用的候选行"""
+
+    def __init__(self, positions, cents, days):
+        entries = sorted((int(days[position]), position) for position in positions)
+        self.days = [day for day, _ in entries]
+        self.positions = [position for _, position in entries]
+        self.cents = cents
+        self.used = set()
+
+    def candidates(self, day, window_days, target):
+        """日期窗口内与 target 同方向、金额绝对值更小的未使用行，按日期远近排列"""
+        lo = bisect_left(self.days, day - window_days)
+        hi = bisect_right(self.days, day + window_days)
+        found = []
+        for i in range(lo, hi):
+            position = self.positions[i]
+            amount = self.cents[position]
+            if position in self.used or not amount or (amount > 0) != (target > 0) or abs(amount) >= abs(target):
+                continue
+            found.append((abs(self.days[i] - day), position))
+        found.sort()
+        return [position for _, position in found]
+
+
+def _search_groups(target, candidate_sets, cents, max_size, max_candidates, deadline, target_budget):
+    """依次在各组候选行中搜索和等于 target 的组合，每组最多搜索 target_budget 秒"""
+    for candidates in candidate_sets:
+        if len(candidates) < 2:
+            continue
+        # 只取日期最近的若干条，再按金额从大到小排列
+        candidates = sorted(candidates[:max_candidates], key=lambda position: -abs(cents[position]))
+        try:
+            found = find_subset(abs(target), [abs(cents[position]) for position in candidates], max_size,
+                                min(deadline, time.perf_counter() + target_budget))
+        except _BudgetExceeded:
+            if time.perf_counter() > deadline:
+                raise
+            # 只是单个目标的搜索超时，继续搜索下一组候选
+            continue
+        if found is not None and len(found) >= 2:
+            return [candidates[i] for i in found]
+    return None
+
+
+def _party_name(name):
+    return str(name).strip() if pd.notna(name) else ''
+
+
+def _same_counterparty(name, descriptions, positions):
+    """摘要中包含对方户名的 GL 行"""
+    name = _party_name(name)
+    if not name:
+        return []
+    return [position for position in positions if name in descriptions[position]]
+
+
+def _same_party_banks(description, names, positions):
+    """对方户名出现在 GL 摘要中的银行流水"""
+    found = []
+    for position in positions:
+        name = _party_name(names[position])
+        if name and name in description:
+            found.append(position)
+    return found
+
+
+def match_groups(bank_data, gl_data, pairs, window_days=GROUP_WINDOW_DAYS, max_size=GROUP_MAX_SIZE,
+                 max_candidates=GROUP_MAX_CANDIDATES, time_budget=GROUP_TIME_BUDGET,
+                 target_budget=GROUP_TARGET_BUDGET, any_counterparty=False):
+    """第二轮匹配：在第一轮剩余的行中查找一笔银行流水对应多条 GL（拆分付款），
+    以及多笔银行流水对应一条 GL 的情况，金额以整数分精确相等
+
+    候选行限定在日期窗口内，且只在对方户名出现在 GL 摘要中的行之间组合；any_counterparty 为 True 时
+    找不到再在窗口内全部行中搜索（容易凑出无关的组合，需人工核对）。单个目标的一组候选搜索超过
+    target_budget 秒时跳过该组，总耗时超过 time_budget 秒后停止。
+    返回 [(银行行位置列表, GL行位置列表), ...]。
+    """
+    deadline = time.perf_counter() + time_budget
+    matched_bank = {bank_position for bank_position, _ in pairs}
+    matched_gl = {gl_position for _, gl_position in pairs}
+
+    bank_cents = to_cents(bank_data['交易金额'])
+    gl_cents = to_cents(gl_data['Base Amount'])
+    bank_days = to_day_numbers(bank_data['日期'])
+    gl_days = to_day_numbers(gl_data['Date'])
+    bank_names = bank_data['对方户名'].tolist()
+    gl_descriptions = gl_data['Description'].fillna('').astype(str).tolist()
+
+    bank_left = [p for p in range(len(bank_data)) if p not in matched_bank and bank_cents[p]]
+    gl_left = [p for p in range(len(gl_data)) if p not in matched_gl and gl_cents[p]]
+    bank_pool = _WindowPool(bank_left, bank_cents, bank_days)
+    gl_pool = _WindowPool(gl_left, gl_cents, gl_days)
+
+    groups = []
+    try:
+        # 一笔银行流水对应多条 GL：摘要中包含对方户名的 GL 行
+        for bank_position in sorted(bank_left, key=lambda p: -abs(bank_cents[p])):
+            if bank_position in bank_pool.used:
+                continue
+            target = bank_cents[bank_position]
+            candidates = gl_pool.candidates(int(bank_days[bank_position]), window_days, target)
+            same_party = _same_counterparty(bank_names[bank_position], gl_descriptions, candidates)
+            candidate_sets = [same_party, candidates] if any_counterparty else [same_party]
+            found = _search_groups(target, candidate_sets, gl_cents, max_size, max_candidates, deadline,
+                                   target_budget)
+            if found:
+                bank_pool.used.add(bank_position)
+                gl_pool.used.update(found)
+                groups.append(([bank_position], found))
+
+        # 多笔银行流水对应一条 GL：按对方户名分组，只搜索户名出现在该 GL 摘要中的分组
+        for gl_position in sorted(gl_left, key=lambda p: -abs(gl_cents[p])):
+            if gl_position in gl_pool.used:
+                continue
+            target = gl_cents[gl_position]
+            candidates = bank_pool.candidates(int(gl_days[gl_position]), window_days, target)
+            by_party = defaultdict(list)
+            for position in _same_party_banks(gl_descriptions[gl_position], bank_names, candidates):
+                by_party[bank_names[position]].append(position)
+            candidate_sets = list(by_party.values()) + ([candidates] if any_counterparty else [])
+            found = _search_groups(target, candidate_sets, bank_cents,
+                                   max_size, max_candidates, deadline, target_budget)
+            if found:
+                gl_pool.used.add(gl_position)
+                bank_pool.used.update(found)
+                groups.append((found, [gl_position]))
+    except _BudgetExceeded:
+        # 超过耗时上限，已找到的组合照常输出
+        pass
+
+    return groups
+
+
+def build_group_frame(bank_data, gl_data, groups):
+    """第二轮匹配结果：每组先列银行流水，再列对应的 GL 行"""
+    gl_dates = format_trans_date(gl_data['Date'])
+
+    rows = []
+    for number, (bank_positions, gl_positions) in enumerate(groups, start=1):
+        for position in bank_positions:
+            row = bank_data.iloc[position]
+            rows.append((row['日期'], row['对方户名'], row['用途'], number, '银行', row['交易金额'],
+                         str(row['交易流水号'])))
+        for position in gl_positions:
+            row = gl_data.iloc[position]
+            rows.append((gl_dates.iloc[position], row['Description'], '', number, '总帐', row['Base Amount'],
+                         row['Reference']))
+
+    return pd.DataFrame(rows, columns=['日期', '对方户名/摘要', '用途', '组号', '来源', '金额', '交易流水号/凭证'])
+
+
+def build_match_frames(bank_data, gl_data, pairs, groups=()):
+    """根据匹配结果生成 Bank_OK / Unmatched_Bank_Data / Unmatched_GL_Data 三张表
+
+    groups 为第二轮匹配的组合，其中的行不再列入未匹配表。
+    """
+    bank_data = bank_data.reset_index(drop=True)
+    gl_data = gl_data.reset_index(drop=True)
+
+    bank_positions = [bank_position for bank_position, _ in pairs]
+    gl_positions = [gl_position for _, gl_position in pairs]
+    bank_hits = bank_data.iloc[bank_positions].reset_index(drop=True)
+    gl_hits = gl_data.iloc[gl_positions].reset_index(drop=True)
+
+    verify_data = pd.DataFrame({
+        '日期': bank_hits['日期'],
+        '对方户名': bank_hits['对方户名'],
+        '用途': bank_hits['用途'],
+        '交易流水号': bank_hits['交易流水号'].astype(str),
+        '借方/贷方': bank_hits['借方/贷方'],
+        '交易金额': bank_hits['交易金额'],
+        '与总帐核对': gl_hits['Reference'],
+        ' ': '',
+        'Check with Bank': bank_hits['交易流水号'].astype(str),
+        'Trans Date': format_trans_date(gl_hits['Date']),
+        'Description': gl_hits['Description'],
+        'Base Amount': gl_hits['Base Amount'],
+    })
+
+    gl_left = gl_data.drop(index=gl_positions + [p for _, group_gl in groups for p in group_gl])
+    unmatched_gl_df = pd.DataFrame({
+        'Trans Date': format_trans_date(gl_left['Date']),
+        'Description': gl_left['Description'],
+        'Base Amount': gl_left['Base Amount'],
+        'Reference': gl_left['Reference'],
+    }).reset_index(drop=True)
+
+    bank_left = bank_data.drop(index=bank_positions + [p for group_bank, _ in groups for p in group_bank])
+    unmatched_bank_df = pd.DataFrame({
+        '日期': bank_left['日期'],
+        '对方户名': bank_left['对方户名'],
+        '用途': bank_left['用途'],
+        '借方/贷方': bank_left['借方/贷方'],
+        '交易金额': bank_left['交易金额'],
+        '交易流水号': bank_left['交易流水号'].astype(str),
+    }).reset_index(drop=True)
+
+    return verify_data, unmatched_bank_df, unmatched_gl_df
+
+
+def match_all(bank_data, gl_data, mode='exact', tolerance=0.0, window_days=None, group_pass=False,
+              group_any_party=False, timer=None):
+    """两轮匹配，返回 (一对一匹配的 (银行行位置, GL行位置) 列表, 第二轮匹配的组合列表)
+
+    mode='exact' 按金额完全相等、顺序认领；mode='window' 见 match_window。
+    group_pass 为 True 时对剩余的行再做一对多 / 多对一匹配，group_any_party 见 match_groups 的 any_counterparty。
+    """
+    with optional_stage(timer, '一对一匹配'):
+        if mode == 'window':
+            pairs = match_window(bank_data, gl_data, tolerance, window_days)
+        elif mode == 'exact':
+            pairs = match_exact(bank_data, gl_data)
+        else:
+            raise ValueError(f"未知的匹配方式: {mode}")
+
+    with optional_stage(timer, '拆分匹配'):
+        groups = match_groups(bank_data, gl_data, pairs, any_counterparty=group_any_party) if group_pass else []
+    return pairs, groups
+
+
+def build_results(bank_data, gl_data, pairs, groups, timer=None):
+    """根据匹配结果生成 (Bank_OK, Unmatched_Bank_Data, Unmatched_GL_Data, Group_Matched)"""
+    with optional_stage(timer, '生成结果表'):
+        verify_data, unmatched_bank_df, unmatched_gl_df = build_match_frames(bank_data, gl_data, pairs, groups)
+        group_matched_df = build_group_frame(bank_data, gl_data, groups)
+    return verify_data, unmatched_bank_df, unmatched_gl_df, group_matched_df
+
+
+def reconcile(bank_data, gl_data, mode='exact', tolerance=0.0, window_days=None, group_pass=False,
+              group_any_party=False, timer=None):
+    """银行与总帐对帐，返回 (Bank_OK, Unmatched_Bank_Data, Unmatched_GL_Data, Group_Matched)
+
+    参数见 match_all；timer 为 StageTimer 时分别记录两轮匹配和生成结果表的耗时。
+    """
+    bank_data = bank_data.reset_index(drop=True)
+    gl_data = gl_data.reset_index(drop=True)
+
+    pairs, groups = match_all(bank_data, gl_data, mode, tolerance, window_days, group_pass, group_any_party, timer)
+    return build_results(bank_data, gl_data, pairs, groups, timer)
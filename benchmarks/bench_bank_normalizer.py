@@ -0,0 +1,91 @@
+"""银行流水整理的微基准：逐行 iterrows 版本与按列版本对比
+
+用法: python benchmarks/bench_bank_normalizer.py [--rows 100000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Bank_Reconciliation_tool import DEFAULT_PAYEE_NAME, normalize_bank_statement
+
+
+def make_statement(rows, seed=0):
+    """生成与工行 .xls 导出相同表头的合成银行流水"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-01-01', periods=366, freq='D').strftime('%Y%m%d').astype(int)
+    payees = np.array(['', '海口供应商A', '三亚供应商B', np.nan], dtype=object)
+    return pd.DataFrame({
+        '交易日期[ Transaction Date ]': rng.choice(days, rows),
+        '收款人名称[ Payee\'s Name ]': rng.choice(payees, rows),
+        '用途[ Purpose ]': rng.choice(np.array(['货款', '工资', '手续费'], dtype=object), rows),
+        '交易金额[ Trade Amount ]': np.round(rng.normal(0, 5000, rows), 2),
+        '交易流水号[ Transaction reference number ]': rng.integers(10 ** 11, 10 ** 12, rows).astype(str),
+    })
+
+
+def normalize_bank_statement_rowwise(df):
+    """旧版 process_bank_data 的逐行实现，仅用于对比"""
+    def convert_date_format(date_str):
+        try:
+            return datetime.strptime(str(date_str), '%Y%m%d').strftime('%Y-%m-%d')
+        except ValueError:
+            return date_str
+
+    new_rows = []
+    for _, row in df.iterrows():
+        transaction_date = convert_date_format(row.get('交易日期[ Transaction Date ]', ''))
+        payee_name = row.get('收款人名称[ Payee\'s Name ]', np.nan)
+        if pd.isna(payee_name) or str(payee_name).strip() == '':
+            payee_name = DEFAULT_PAYEE_NAME
+
+        trade_amount = float(row.get('交易金额[ Trade Amount ]', 0.0))
+        debit_credit = "收款" if trade_amount > 0 else "付款" if trade_amount < 0 else ""
+
+        new_rows.append({
+            '日期': transaction_date,
+            '对方户名': payee_name,
+            '用途': row.get('用途[ Purpose ]', ''),
+            '交易金额': trade_amount,
+            '借方/贷方': debit_credit,
+            '交易流水号': str(row.get('交易流水号[ Transaction reference number ]', ''))
+        })
+    return pd.DataFrame(new_rows)
+
+
+def best_of(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_statement(args.rows)
+
+    rowwise_time, expected = best_of(normalize_bank_statement_rowwise, df, 1)
+    columnar_time, result = best_of(normalize_bank_statement, df, args.repeat)
+
+    pd.testing.assert_frame_equal(result.astype(str), expected.astype(str))
+
+    print(f"rows:      {args.rows}")
+    print(f"iterrows:  {rowwise_time:.3f}s")
+    print(f"columnar:  {columnar_time:.3f}s")
+    print(f"speedup:   {rowwise_time / columnar_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
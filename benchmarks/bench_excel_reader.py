@@ -0,0 +1,94 @@
+"""Excel 读取后端基准：对比各后端的读取耗时和峰值内存（RSS）
+
+用法:
+  python benchmarks/bench_excel_reader.py --gl gl.xlsx --bank bank.xls --aged aged.xlsm
+
+每个 (文件, 后端) 组合在独立子进程中运行，峰值 RSS 互不影响。
+峰值 RSS 通过 resource 模块获取，Windows 上不可用时只报告耗时。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_reader import BACKENDS, available_backends, read_sheet, resolve_backend
+
+# 各类文件的读取参数，与工具中的调用一致
+FILE_KINDS = {
+    'gl': {'sheet_name': 'sheet1', 'skiprows': 1},
+    'bank': {'sheet_name': 0, 'skiprows': 8},
+    'aged': {'sheet_name': 'Aged Reports', 'skiprows': 2},
+}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 单位为字节，Linux 为 KB
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(kind, backend, file_path):
+    """子进程：读取一次文件并输出 JSON 结果"""
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    df = read_sheet(file_path, backend=backend, **FILE_KINDS[kind])
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({
+        'rows': len(df),
+        'seconds': elapsed,
+        'peak_rss_mb': peak,
+        'baseline_rss_mb': baseline,
+    }))
+
+
+def measure(kind, backend, file_path):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', kind, backend, file_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    for kind in FILE_KINDS:
+        parser.add_argument(f'--{kind}', help=f'{kind} 样本文件')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--child', nargs=3, metavar=('KIND', 'BACKEND', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    files = [(kind, getattr(args, kind)) for kind in FILE_KINDS if getattr(args, kind)]
+    if not files:
+        parser.error('至少需要指定 --gl、--bank 或 --aged 中的一个文件')
+
+    print(f"available backends: {', '.join(available_backends())}")
+    print(f"{'file':<6} {'backend':<10} {'rows':>8} {'seconds':>9} {'peak RSS MB':>12}")
+    for kind, file_path in files:
+        measured = set()
+        for backend in args.backends:
+            # 不支持的后端会回退，回退后相同的组合只测一次
+            actual = resolve_backend(file_path, backend)
+            if actual in measured:
+                continue
+            measured.add(actual)
+            result = measure(kind, actual, file_path)
+            peak = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else 'n/a'
+            label = 'xlrd' if actual == 'openpyxl' and file_path.lower().endswith('.xls') else actual
+            print(f"{kind:<6} {label:<10} {result['rows']:>8} {result['seconds']:>9.3f} {peak:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""各工具流程的端到端和分阶段耗时基准，使用 synthetic_data 生成的模拟数据
+
+用法:
+  python benchmarks/bench_pipelines.py --rows 1000 10000 100000
+  python benchmarks/bench_pipelines.py --rows 10000 --pipelines bank --memory --json results.json
+
+模拟数据保存在 --data-dir 中，同样行数的文件已存在时直接使用。
+运行期间关闭解析缓存（PARSE_CACHE=0），每次都完整读取源文件。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import pandas as pd
+
+import synthetic_data
+from stage_timer import StageTimer
+
+PIPELINES = ('aging', 'bank', 'bldbuy')
+
+# 各流程使用的模拟文件
+_FILE_MAKERS = {
+    'aged': ('aged_{rows}.xlsm', synthetic_data.make_aged_report),
+    'gl': ('gl_{rows}.xlsx', synthetic_data.make_gl_extract),
+    'bank': ('bank_{rows}.xls', synthetic_data.make_bank_statement),
+    'receiving': ('receiving_{rows}.xlsx', synthetic_data.make_receiving_export),
+}
+_PIPELINE_FILES = {
+    'aging': ['aged'],
+    'bank': ['gl', 'bank'],
+    'bldbuy': ['receiving'],
+}
+
+
+def ensure_files(data_dir, rows, kinds, seed):
+    """生成（或复用）模拟文件，返回 {类型: 路径}"""
+    os.makedirs(data_dir, exist_ok=True)
+    files = {}
+    for kind in kinds:
+        pattern, maker = _FILE_MAKERS[kind]
+        path = os.path.join(data_dir, pattern.format(rows=rows))
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            maker(path, rows, seed=seed)
+            print(f"  generated {os.path.basename(path)} in {time.perf_counter() - start:.1f}s")
+        files[kind] = path
+    header = os.path.join(data_dir, 'header.xlsx')
+    if not os.path.exists(header):
+        synthetic_data.make_statement_header(header)
+    files['header'] = header
+    return files
+
+
+def bench_aging(files, work_dir, timer, workers):
+    from ap_aging_engine import build_aging_table, ingest_monthly_aggregates, pivot_by_month, write_aging_report
+
+    # 与界面工具相同的流程：按文件读取清理并汇总到供应商和月份
+    with timer.stage('读取汇总'):
+        grouped, row_count, _ = ingest_monthly_aggregates([files['aged']], workers=1)
+    with timer.stage('透视'):
+        pivot_table = pivot_by_month(grouped)
+    with timer.stage('统计'):
+        result_df, stats_row, _ = build_aging_table(pivot_table)
+    with timer.stage('保存'):
+        write_aging_report(os.path.join(work_dir, 'AP_Aging_Report.xlsx'), result_df, stats_row)
+    return {'rows': row_count, 'suppliers': len(result_df)}
+
+
+def bench_bank(files, work_dir, timer, workers):
+    from Bank_Reconciliation_tool import (GROUP_ANY_PARTY, GROUP_MATCH, MATCH_MODE, MATCH_TOLERANCE,
+                                          MATCH_WINDOW_DAYS, clean_gl_data, process_bank_data, write_reconciliation)
+    from bank_matching import reconcile
+
+    with timer.stage('读取总帐'):
+        gl_data = clean_gl_data(files['gl'])
+    with timer.stage('读取银行流水'):
+        bank_data = process_bank_data(files['bank'])
+
+    gl_data['Base Amount'] = pd.to_numeric(gl_data['Base Amount'], errors='coerce')
+    bank_data['交易金额'] = pd.to_numeric(bank_data['交易金额'], errors='coerce')
+
+    verify_data, unmatched_bank_df, unmatched_gl_df, group_matched_df = reconcile(
+        bank_data, gl_data, mode=MATCH_MODE, tolerance=MATCH_TOLERANCE, window_days=MATCH_WINDOW_DAYS,
+        group_pass=GROUP_MATCH, group_any_party=GROUP_ANY_PARTY, timer=timer)
+
+    with timer.stage('写入'):
+        write_reconciliation(os.path.join(work_dir, 'Combined_Data.xlsx'), gl_data, bank_data, verify_data,
+                             unmatched_bank_df, unmatched_gl_df, group_matched_df if GROUP_MATCH else None)
+    return {
+        'rows': len(gl_data) + len(bank_data),
+        'matched': len(verify_data),
+        'group_matched': int(group_matched_df['组号'].nunique()),
+    }
+
+
+def bench_bldbuy(files, work_dir, timer, workers):
+    from bldbuy_engine import run_batch
+
+    # 处理完成后源文件会被移到归档文件夹，因此使用副本
+    input_file = shutil.copy(files['receiving'], os.path.join(work_dir, os.path.basename(files['receiving'])))
+    statements = []
+    succeeded, failed = run_batch([input_file], os.path.join(work_dir, 'export'), os.path.join(work_dir, 'archive'),
+                                  workers, files['header'],
+                                  log=lambda message: statements.append(message) if message.startswith('已成功创建') else None,
+                                  timer=timer)
+    if failed:
+        raise RuntimeError('对帐单生成失败')
+    return {'statements': len(statements)}
+
+
+BENCHMARKS = {
+    'aging': bench_aging,
+    'bank': bench_bank,
+    'bldbuy': bench_bldbuy,
+}
+
+
+def run_one(pipeline, rows, files, trace_memory, workers):
+    timer = StageTimer(pipeline, trace_memory=trace_memory)
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 流程内部写出的耗时报告也放在临时文件夹中
+        os.environ['STAGE_TIMER_DIR'] = work_dir
+        info = BENCHMARKS[pipeline](files, work_dir, timer, workers)
+    info.setdefault('rows', rows)
+    return timer.report(size=rows, **info)
+
+
+def print_result(result):
+    total = result['total_seconds']
+    throughput = result['rows'] / total if total else 0
+    stages = ' | '.join(f"{stage['name']} {stage['seconds']:.2f}s" for stage in result['stages'])
+    print(f"{result['pipeline']:<8} {result['size']:>9} {total:>9.2f}s {throughput:>11.0f} rows/s   {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000], help='模拟数据行数，可指定多个')
+    parser.add_argument('--pipelines', nargs='+', default=list(PIPELINES), choices=PIPELINES)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'finance_bench_data'),
+                        help='模拟数据文件夹')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help='对帐单生成的并行进程数')
+    parser.add_argument('--memory', action='store_true', help='用 tracemalloc 记录各阶段内存峰值')
+    parser.add_argument('--json', help='结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    os.environ['PARSE_CACHE'] = '0'
+
+    results = []
+    for rows in args.rows:
+        kinds = [kind for pipeline in args.pipelines for kind in _PIPELINE_FILES[pipeline]]
+        files = ensure_files(args.data_dir, rows, kinds, args.seed)
+        for pipeline in args.pipelines:
+            result = run_one(pipeline, rows, files, args.memory, args.workers)
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pandas': pd.__version__,
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
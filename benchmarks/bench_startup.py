@@ -0,0 +1,94 @@
+"""启动耗时基准：导入各工具模块的总耗时，以及耗时最多的被导入模块
+
+用法:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --modules AP_Aging_Report_UI --top 15 --repeat 5
+
+每次测量在新的子进程中用 python -X importtime 导入模块，取多次中最快的一次。
+同时列出导入时是否已加载 pandas / numpy / openpyxl（界面程序应在首次处理时才加载）。
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各工具的入口模块
+DEFAULT_MODULES = [
+    'AP_Aging_Report_UI',
+    'bldbuy_Reconciliation_SFT',
+    'bldbuy_cli',
+    'Bank_Reconciliation_tool',
+]
+
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl')
+
+# -X importtime 的输出格式：import time: self [us] | cumulative | imported package
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_profile(module):
+    """在子进程中导入模块，返回 [(模块名, 自身耗时us, 累计耗时us, 嵌套层级)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr.strip().splitlines()[-1]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def best_profile(module, repeat):
+    """多次测量取总耗时最少的一次"""
+    profiles = [import_profile(module) for _ in range(repeat)]
+    return min(profiles, key=lambda entries: entries[-1][2] if entries else 0)
+
+
+def report(module, entries, top):
+    total_ms = entries[-1][2] / 1000 if entries else 0.0
+    loaded = {name.split('.')[0] for name, _, _, _ in entries}
+    heavy = [name for name in HEAVY_MODULES if name in loaded]
+
+    print(f"\n{module}: {total_ms:.1f} ms")
+    print(f"  heavy modules loaded: {', '.join(heavy) if heavy else '-'}")
+
+    # 按模块直接导入的顶层包汇总（嵌套层级为1的条目），避免重复计算
+    packages = {}
+    for name, _, cumulative_us, level in entries:
+        if level == 1:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + cumulative_us
+
+    print(f"  {'package':<32} {'cumulative ms':>14}")
+    for package, cumulative_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<32} {cumulative_us / 1000:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES, help='要测量的模块')
+    parser.add_argument('--top', type=int, default=10, help='每个模块列出的包数量')
+    parser.add_argument('--repeat', type=int, default=3, help='每个模块测量次数，取最快的一次')
+    args = parser.parse_args()
+
+    print(f"python {sys.version.split()[0]}")
+    for module in args.modules:
+        try:
+            entries = best_profile(module, max(1, args.repeat))
+        except RuntimeError as e:
+            print(f"\n{module}: {e}")
+            continue
+        report(module, entries, args.top)
+
+
+if __name__ == '__main__':
+    main()
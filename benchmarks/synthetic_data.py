@@ -0,0 +1,216 @@
+"""基准测试用的模拟数据，版式与各工具读取的真实导出文件一致，不含任何真实数据
+
+  make_aged_report      帐龄报表 .xlsm：Aged Reports 工作表，前两行说明，供应商标题行、明细行和 Total 行
+  make_gl_extract       总帐导出 .xlsx：sheet1 工作表，第一行标题，约一半为科目 115307
+  make_bank_statement   工商银行流水 .xls：前8行说明，表头为 交易日期[ Transaction Date ] 等
+  make_receiving_export 收货单商品明细 .xlsx：前28行说明，第29行为表头
+  make_statement_header 对帐单标题 header.xlsx
+
+同一 seed 生成的文件内容相同。银行流水与总帐中 115307 的行大部分可一对一匹配，
+另有部分一笔银行流水对应多条总帐（拆分付款）。
+
+用法:
+  python benchmarks/synthetic_data.py --rows 10000 --out bench_data
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from openpyxl import Workbook
+
+# .xls 单个工作表最多 65536 行
+XLS_MAX_ROWS = 65536
+
+BANK_HEADERS = [
+    '交易日期[ Transaction Date ]', '交易时间[ Transaction Time ]', '凭证号[ Voucher No. ]',
+    '收款人名称[ Payee\'s Name ]', '收款人账号[ Payee\'s Account Number ]', '用途[ Purpose ]',
+    '交易金额[ Trade Amount ]', '余额[ Balance ]', '交易流水号[ Transaction reference number ]',
+]
+
+GL_HEADERS = ['Account', 'Journal Date', 'Journal No', 'User', 'Line Description', 'Base Amount', 'Currency']
+
+AGED_HEADERS = ['Transaction Date', 'Transaction Reference', 'Total',
+                '30 days', '60 days', '90 days', '120 days', '150 days', '180 days']
+
+RECEIVING_HEADERS = [
+    "收货日期", "订单号", "商品编码", "商品名称", "规格", "实收数量", "基本单位",
+    "单价(结算)", "小计金额(结算)", "税额(结算)", "小计价税(结算)", "部门",
+    "税率", "供应商/备用金报销账户", "备注",
+]
+
+_START_DATE = datetime(2024, 1, 1)
+
+
+def _write_rows(file_path, sheet_name, rows):
+    """以只写模式写出 xlsx，行数很多时内存占用也不大"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    for row in rows:
+        ws.append(row)
+    wb.save(file_path)
+    return file_path
+
+
+def make_aged_report(file_path, rows=10000, lines_per_supplier=20, seed=0):
+    """帐龄报表：每个供应商一行标题（编号、名称）、若干明细行和一行 Total"""
+    rng = np.random.default_rng(seed)
+    suppliers = max(1, rows // (lines_per_supplier + 2))
+
+    def generate():
+        yield ['Aged Creditors Report'] + [None] * 8
+        yield [None] * 9
+        yield AGED_HEADERS
+        for supplier in range(suppliers):
+            yield [f'V{supplier:05d}', f'供应商 {supplier} 有限公司'] + [None] * 7
+            buckets = np.round(rng.random((lines_per_supplier, 6)) * 1000, 2)
+            days = rng.integers(0, 540, lines_per_supplier)
+            for line in range(lines_per_supplier):
+                values = buckets[line].tolist()
+                date = _START_DATE + timedelta(days=int(days[line]))
+                yield [date, f'INV-{supplier}-{line}', round(sum(values), 2)] + values
+            yield [f'Total V{supplier:05d}', None, None] + [None] * 6
+
+    return _write_rows(file_path, 'Aged Reports', generate())
+
+
+def _reconciliation_amounts(rows, seed):
+    """总帐 115307 行和银行流水的金额、日期：70% 一对一，10% 拆分付款，其余只在一边出现"""
+    rng = np.random.default_rng(seed)
+    gl_amounts = np.round(rng.integers(-500000, 500000, rows) / 100, 2)
+    gl_amounts[gl_amounts == 0] = 1.0
+    gl_days = rng.integers(0, 365, rows)
+
+    bank = []
+    position = 0
+    while position < rows:
+        kind = rng.random()
+        if kind < 0.7:
+            bank.append((gl_amounts[position], gl_days[position] + int(rng.integers(0, 3))))
+            position += 1
+        elif kind < 0.8 and position + 3 <= rows:
+            # 拆分付款：同方向的3条总帐合并为一笔银行流水
+            parts = np.abs(gl_amounts[position:position + 3])
+            sign = 1 if gl_amounts[position] > 0 else -1
+            gl_amounts[position:position + 3] = parts * sign
+            gl_days[position:position + 3] = gl_days[position]
+            bank.append((round(float(parts.sum()) * sign, 2), gl_days[position]))
+            position += 3
+        else:
+            bank.append((round(float(rng.integers(-500000, 500000)) / 100, 2) or 1.0, int(rng.integers(0, 365))))
+            position += 1
+    return gl_amounts, gl_days, bank
+
+
+def make_gl_extract(file_path, rows=10000, seed=0):
+    """总帐导出：科目 115307 与其它科目交替出现，rows 为 115307 的行数"""
+    gl_amounts, gl_days, _ = _reconciliation_amounts(rows, seed)
+    rng = np.random.default_rng(seed + 1)
+
+    def generate():
+        yield ['General Ledger Extract'] + [None] * (len(GL_HEADERS) - 1)
+        yield GL_HEADERS
+        for i in range(rows):
+            date = _START_DATE + timedelta(days=int(gl_days[i]))
+            yield ['115307', date, f'JN{i:07d}', f'U{i % 50:03d}', f'付 Payee {i % 500} 款项', float(gl_amounts[i]), 'CNY']
+            # 其它科目的行，读取时会被过滤掉
+            yield ['100100', date, f'JX{i:07d}', f'U{i % 50:03d}', f'other {i}',
+                   round(float(rng.integers(-100000, 100000)) / 100, 2), 'CNY']
+
+    return _write_rows(file_path, 'sheet1', generate())
+
+
+def make_bank_statement(file_path, rows=10000, seed=0):
+    """工商银行流水 .xls（需要 xlwt）；受 .xls 行数限制，最多写入 65527 行流水"""
+    import xlwt
+
+    _, _, bank = _reconciliation_amounts(rows, seed)
+    bank = bank[:XLS_MAX_ROWS - 9]
+
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet('sheet1')
+    for r in range(8):
+        ws.write(r, 0, f'中国工商银行 账户明细 说明 {r}')
+    for c, header in enumerate(BANK_HEADERS):
+        ws.write(8, c, header)
+
+    balance = 1000000.0
+    for i, (amount, day) in enumerate(bank):
+        r = 9 + i
+        date = _START_DATE + timedelta(days=int(day))
+        balance += amount
+        ws.write(r, 0, int(date.strftime('%Y%m%d')))
+        ws.write(r, 1, f'{i % 24:02d}:{i % 60:02d}:00')
+        ws.write(r, 2, f'V{i:08d}')
+        # 约三分之一的流水收款人名称为空
+        ws.write(r, 3, '' if i % 3 == 0 else f'Payee {i % 500}')
+        ws.write(r, 4, f'6222{i:012d}')
+        ws.write(r, 5, f'货款 {i}')
+        ws.write(r, 6, float(amount))
+        ws.write(r, 7, round(balance, 2))
+        ws.write(r, 8, f'{900000000 + i}')
+    wb.save(file_path)
+    return file_path
+
+
+def make_receiving_export(file_path, rows=10000, suppliers=None, seed=0):
+    """收货单商品明细：前28行为报表说明，第29行为表头，另含读取时会被丢弃的列"""
+    rng = np.random.default_rng(seed)
+    suppliers = suppliers or max(1, rows // 40)
+    tax_rates = [0.0, 0.06, 0.09, 0.13]
+
+    def generate():
+        for r in range(28):
+            yield [f'收货单商品明细 说明 {r}'] + [None] * (len(RECEIVING_HEADERS) - 1)
+        yield RECEIVING_HEADERS
+        quantities = rng.integers(1, 50, rows)
+        prices = np.round(rng.random(rows) * 200, 2)
+        rates = rng.integers(0, len(tax_rates), rows)
+        supplier_ids = rng.integers(0, suppliers, rows)
+        for i in range(rows):
+            quantity = float(quantities[i])
+            price = float(prices[i])
+            rate = tax_rates[rates[i]]
+            subtotal = round(quantity * price, 2)
+            tax = round(subtotal * rate, 2)
+            yield [
+                _START_DATE + timedelta(days=i % 28), f'PO{i:07d}', f'SKU{i % 3000:05d}', f'商品 {i % 3000}',
+                '500g', quantity, '个', price, subtotal, tax, round(subtotal + tax, 2), f'部门 {i % 8}',
+                rate, f'供应商 {supplier_ids[i]}', None,
+            ]
+
+    return _write_rows(file_path, 'Sheet1', generate())
+
+
+def make_statement_header(file_path):
+    """对帐单前5行标题"""
+    rows = [['采购对帐单'], ['供应商：'], ['期间：'], ['单位：元'], [None]]
+    return _write_rows(file_path, 'Sheet1', rows)
+
+
+def generate_all(out_dir, rows, seed=0):
+    """生成所有模拟文件，返回 {类型: 路径}"""
+    os.makedirs(out_dir, exist_ok=True)
+    return {
+        'aged': make_aged_report(os.path.join(out_dir, f'aged_{rows}.xlsm'), rows, seed=seed),
+        'gl': make_gl_extract(os.path.join(out_dir, f'gl_{rows}.xlsx'), rows, seed=seed),
+        'bank': make_bank_statement(os.path.join(out_dir, f'bank_{rows}.xls'), rows, seed=seed),
+        'receiving': make_receiving_export(os.path.join(out_dir, f'receiving_{rows}.xlsx'), rows, seed=seed),
+        'header': make_statement_header(os.path.join(out_dir, 'header.xlsx')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000], help='行数，可指定多个（1000 到 1000000）')
+    parser.add_argument('--out', default='bench_data', help='输出文件夹')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        for kind, path in generate_all(args.out, rows, args.seed).items():
+            print(f"{kind:<10} {path}")
+
+
+if __name__ == '__main__':
+    main()
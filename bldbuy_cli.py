@@ -0,0 +1,56 @@
+"""采购对帐单命令行批处理（无界面），供计划任务调用
+
+示例：
+  python bldbuy_cli.py "import/*.xlsx" --output export --archive archive --workers 4
+
+参数解析完成后才导入 pandas / openpyxl，--help 等可以立即返回。
+有文件处理失败时退出码为 1。
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+
+
+def expand_inputs(patterns):
+    """展开输入的通配符（Windows 命令行不会自动展开），去重并保持顺序"""
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.isfile(path) and path not in files:
+                files.append(path)
+    return files
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="根据收货单商品明细生成供应商对帐单")
+    parser.add_argument('inputs', nargs='+', help="收货明细文件，可使用通配符，如 import/*.xlsx")
+    parser.add_argument('-o', '--output', default='export', help="对帐单输出文件夹（默认 export）")
+    parser.add_argument('-a', '--archive', default='archive', help="源文件归档文件夹（默认 archive）")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="并行进程数，1 表示顺序生成（默认 CPU 核数，最多 4）")
+    parser.add_argument('--header', default=None, help="对帐单标题 header.xlsx（默认当前目录下的 header.xlsx）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    input_files = expand_inputs(args.inputs)
+    if not input_files:
+        print("未找到要处理的文件", file=sys.stderr)
+        return 1
+
+    from bldbuy_engine import default_workers, run_batch
+
+    workers = args.workers if args.workers is not None else default_workers()
+    succeeded, failed = run_batch(input_files, args.output, args.archive, workers, args.header)
+    print(f"成功 {succeeded} 个文件，失败 {failed} 个文件")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # PyInstaller 打包后子进程需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,442 @@
+"""采购对帐单生成流程：读取收货明细 → 按供应商和税率分组 → 生成对帐单 → 归档源文件
+
+界面（bldbuy_Reconciliation_SFT.py）和命令行（bldbuy_cli.py）共用。
+openpyxl 只在读取 header.xlsx 和生成对帐单时才导入。
+"""
+import os
+import shutil
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bldbuy_workers import default_workers
+from excel_reader import iter_sheet_rows, read_sheet
+from stage_timer import StageTimer, optional_stage
+
+# 期望的表头字段
+EXPECTED_HEADERS = [
+    "收货日期", "订单号", "商品名称", "实收数量", "基本单位",
+    "单价(结算)", "小计金额(结算)", "税额(结算)", "小计价税(结算)", "部门",
+    "税率", "供应商/备用金报销账户"
+]
+
+# 收货明细导出文件前28行为报表说明，第29行为表头
+RECEIVING_SKIPROWS = 28
+
+# 流式读取时每批转换为 DataFrame 的行数
+RECEIVING_CHUNKSIZE = 10000
+
+# 分组和组内排序使用的列
+GROUP_COLUMNS = ['供应商/备用金报销账户', '税率']
+SORT_COLUMNS = ['部门', '收货日期']
+
+# header.xlsx 缓存：{路径: ((修改时间, 文件大小), 标题块)}
+_header_cache = {}
+
+
+def build_header_block(header_rows):
+    """对帐单的标题块：header.xlsx 的行加上表头行，返回 [(值, 命名样式名), ...]
+
+    每行补足到表头列数，空单元格也套用样式；超出表头范围的列原样写入、不套用样式。
+    """
+    width = len(EXPECTED_HEADERS)
+    block = [(tuple(row) + (None,) * (width - len(row)), 'statement_title') for row in header_rows]
+    block.append((tuple(EXPECTED_HEADERS), 'statement_header'))
+    return block
+
+
+def load_header_block(header_file):
+    """读取 header.xlsx 前5行生成标题块，文件未修改时直接使用缓存；文件不存在返回 None"""
+    try:
+        stat = os.stat(header_file)
+    except FileNotFoundError:
+        _header_cache.pop(header_file, None)
+        return None
+
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _header_cache.get(header_file)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    from openpyxl import load_workbook
+
+    wb_header = load_workbook(filename=header_file)
+    ws_header = wb_header.active
+    header_block = build_header_block(ws_header.iter_rows(min_row=1, max_row=5, values_only=True))
+
+    _header_cache[header_file] = (key, header_block)
+    return header_block
+
+
+def projected_headers(columns):
+    """只保留期望的列；基本单位列始终保留，源文件没有时为空列"""
+    return [col for col in EXPECTED_HEADERS if col in columns or col == '基本单位']
+
+
+def iter_receiving_chunks(file_path, chunksize=RECEIVING_CHUNKSIZE):
+    """流式逐行读取收货明细，读取时只投影期望的列，按批产出 DataFrame"""
+    rows = iter_sheet_rows(file_path, min_row=RECEIVING_SKIPROWS + 1)
+    try:
+        header = next(rows, None)
+        if header is None:
+            return
+        positions = {}
+        for idx, name in enumerate(header):
+            if name is not None and str(name) not in positions:
+                positions[str(name)] = idx
+        columns = projected_headers(positions)
+        indexes = [positions.get(col) for col in columns]
+
+        chunk = []
+        yielded = False
+        for row in rows:
+            chunk.append([row[idx] if idx is not None and idx < len(row) else np.nan for idx in indexes])
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+                yielded = True
+        # 没有数据行时也产出一个空表，保留表头中的列
+        if chunk or not yielded:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        rows.close()
+
+
+def iter_receiving_frames(file_path, chunksize=RECEIVING_CHUNKSIZE):
+    """按批产出投影到期望列的收货明细，.xlsx 流式读取，.xls 仍由 pandas 整表读取为一批"""
+    if file_path.lower().endswith('.xls'):
+        df = read_sheet(file_path, skiprows=RECEIVING_SKIPROWS)
+        yield df.reindex(columns=projected_headers(df.columns))
+    else:
+        yield from iter_receiving_chunks(file_path, chunksize)
+
+
+def group_receiving_export(file_path, chunksize=RECEIVING_CHUNKSIZE):
+    """逐批读取收货明细并按供应商和税率分组，不拼接和排序整张明细表
+
+    收货日期逐批转换为 'YYYY-MM-DD'，每批拆开追加到各分组，最后在组内按部门、收货日期稳定排序，
+    结果与整表排序后分组相同。返回 (列名, 最早收货日期, [(分组名, 分组数据), ...])；
+    文件缺少期望的列时不读取数据，只返回列名。
+    """
+    earliest_date = None
+    buffers = {}
+    with closing(iter_receiving_frames(file_path, chunksize)) as frames:
+        columns = projected_headers([])
+        for chunk in frames:
+            columns = list(chunk.columns)
+            if set(EXPECTED_HEADERS) - set(columns):
+                return columns, None, []
+
+            chunk = chunk.dropna(how='all')
+            chunk['收货日期'] = pd.to_datetime(chunk['收货日期'], errors='coerce').dt.strftime('%Y-%m-%d')
+            chunk_earliest = chunk['收货日期'].min()
+            if isinstance(chunk_earliest, str) and (earliest_date is None or chunk_earliest < earliest_date):
+                earliest_date = chunk_earliest
+
+            for group_name, group_chunk in chunk.groupby(GROUP_COLUMNS, sort=False):
+                buffers.setdefault(group_name, []).append(group_chunk)
+
+    groups = []
+    for group_name in sorted(buffers):
+        group_data = pd.concat(buffers.pop(group_name), ignore_index=True)
+        groups.append((group_name, group_data.sort_values(by=SORT_COLUMNS, kind='stable', ignore_index=True)))
+    return columns, earliest_date, groups
+
+
+def statement_filename(group_name, year_month):
+    """根据供应商和税率生成对帐单文件名"""
+    supplier_account, efficiency = group_name
+
+    sanitized_supplier_account = ''.join([c if c.isalnum() or c in (' ', '.') else '_' for c in str(supplier_account)])
+    sanitized_efficiency = f"{int(efficiency * 100)}%" if pd.notna(efficiency) else '0%'
+    sanitized_efficiency = ''.join([c if c.isalnum() or c in (' ', '%') else '_' for c in sanitized_efficiency])
+
+    return f"{year_month}_{sanitized_supplier_account}_{sanitized_efficiency}.xlsx"
+
+
+# 对帐单样式：字体、填充和对齐对象在首次生成时创建后全局共享，每个工作簿只注册一次命名样式
+_statement_styles = None
+
+
+def _get_statement_styles():
+    global _statement_styles
+    if _statement_styles is None:
+        from openpyxl.styles import Alignment, Font, PatternFill
+
+        center_alignment = Alignment(horizontal="center", vertical="center")
+        title_fill = PatternFill(start_color='1F497D', end_color='1F497D', fill_type='solid')
+        _statement_styles = [
+            ('statement_title', Font(color='FFFFFF', size=16, name='微软雅黑', bold=True), title_fill, center_alignment),
+            ('statement_header', Font(color='FFFFFF', size=9, name='微软雅黑', bold=True), title_fill, center_alignment),
+            ('statement_data', Font(size=10, name='微软雅黑'), None, center_alignment),
+        ]
+    return _statement_styles
+
+
+def _register_statement_styles(wb):
+    from openpyxl.styles import NamedStyle
+
+    for name, font, fill, alignment in _get_statement_styles():
+        style = NamedStyle(name=name, font=font, alignment=alignment)
+        if fill is not None:
+            style.fill = fill
+        wb.add_named_style(style)
+
+
+def _format_tax_rates(tax_rates):
+    """税率转换为百分比文本，空值为 0%"""
+    percents = (tax_rates.astype(float).fillna(0) * 100).astype(int)
+    return percents.astype(str) + '%'
+
+
+def _column_widths(statement_df, total_row):
+    """按 DataFrame 计算列宽：表头、数据和合计行中最长内容加 8"""
+    widths = []
+    for idx, header in enumerate(statement_df.columns):
+        lengths = statement_df.iloc[:, idx].astype(str).str.len()
+        max_length = max(len(str(header)), lengths.max() if lengths.notna().any() else 0)
+        if total_row[idx] is not None:
+            max_length = max(max_length, len(total_row[idx]))
+        widths.append(int(max_length) + 8)
+    return widths
+
+
+def _style_arrays(ws):
+    """各命名样式对应的单元格样式，每个工作簿只解析一次"""
+    from openpyxl.cell import Cell
+
+    arrays = {}
+    for name, _, _, _ in _get_statement_styles():
+        cell = Cell(ws)
+        cell.style = name
+        arrays[name] = cell._style
+    return arrays
+
+
+def _styled_cells(ws, values, style_array):
+    """一行单元格，表头范围内的单元格（包括空单元格）套用同一样式"""
+    from openpyxl.cell import Cell
+
+    width = len(EXPECTED_HEADERS)
+    return [Cell(ws, value=value, style_array=style_array if idx < width else None)
+            for idx, value in enumerate(values)]
+
+
+def render_statement(group_name, group_data, year_month, year_month_folder, header_block):
+    """生成并保存单个分组的对帐单，返回文件名（可在子进程中执行）"""
+    output_filename = statement_filename(group_name, year_month)
+    output_filepath = os.path.join(year_month_folder, output_filename)
+
+    # 税率格式化为百分比
+    statement_df = group_data.copy()
+    statement_df['税率'] = _format_tax_rates(statement_df['税率'])
+
+    # 合计行
+    total_row = [None] * len(EXPECTED_HEADERS)
+    total_row[EXPECTED_HEADERS.index("单价(结算)")] = "合计"
+    for column in ["小计金额(结算)", "税额(结算)", "小计价税(结算)"]:
+        total_row[EXPECTED_HEADERS.index(column)] = "{:.2f}".format(group_data[column].sum())
+
+    from openpyxl import Workbook
+
+    # 创建Excel文件
+    wb = Workbook()
+    _register_statement_styles(wb)
+    ws = wb.active
+    ws.title = "Statement"
+
+    # 按行写入带样式的单元格：标题块（已按行准备好样式名）、数据和合计行
+    style_arrays = _style_arrays(ws)
+    for values, style in header_block:
+        ws.append(_styled_cells(ws, values, style_arrays[style]))
+    for row in statement_df.itertuples(index=False, name=None):
+        ws.append(_styled_cells(ws, row, style_arrays['statement_data']))
+    ws.append(_styled_cells(ws, total_row, style_arrays['statement_header']))
+
+    # 设置列宽和页面布局
+    apply_styles(ws, _column_widths(statement_df, total_row))
+
+    # 保存文件
+    wb.save(output_filepath)
+    return output_filename
+
+
+def apply_styles(ws, column_widths):
+    """设置列宽和页面布局（单元格样式在写入时已套用）"""
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.page import PageMargins
+
+    # 列宽（header 中超出表头范围的列只有标题内容，按空列处理）
+    for idx in range(1, ws.max_column + 1):
+        width = column_widths[idx - 1] if idx <= len(column_widths) else 8
+        ws.column_dimensions[get_column_letter(idx)].width = width
+
+    # 设置页面布局
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    ws.page_margins = PageMargins(top=0.25, left=0.2, right=0, bottom=1.05, header=0, footer=0.5)
+    ws.page_setup.horizontalCentered = True
+    ws.page_setup.verticalCentered = True
+    ws.sheet_properties.pageSetUpPr.fitToPage = True
+    ws.page_setup.fitToHeight = False
+    ws.page_setup.fitToWidth = 1
+    ws.oddFooter.center.text = "Page &[Page] of &[Pages]"
+    ws.print_title_rows = '1:6'
+    ws.freeze_panes = 'A7'
+
+
+def render_statements(groups, year_month, year_month_folder, header_block, executor=None):
+    """生成一个文件内所有分组的对帐单，逐个产出 (分组名, 文件名, 异常)
+
+    executor 为 None 时在当前线程顺序生成；传入进程池时并行生成，按完成顺序产出。
+    每个分组写入独立文件，因此并行与顺序生成的结果相同。
+    """
+    if executor is None:
+        for group_name, group_data in groups:
+            try:
+                yield group_name, render_statement(group_name, group_data, year_month, year_month_folder, header_block), None
+            except Exception as e:
+                yield group_name, None, e
+        return
+
+    futures = {
+        executor.submit(render_statement, group_name, group_data, year_month, year_month_folder, header_block): group_name
+        for group_name, group_data in groups
+    }
+    for future in as_completed(futures):
+        try:
+            yield futures[future], future.result(), None
+        except Exception as e:
+            yield futures[future], None, e
+
+
+def create_executor(workers):
+    """workers 大于 1 时创建进程池，否则返回 None 表示顺序生成"""
+    if workers and workers > 1:
+        return ProcessPoolExecutor(max_workers=workers)
+    return None
+
+
+def archive_file(input_file, archive_folder):
+    """把处理完的源文件移到归档文件夹，重名时加时间戳，返回归档路径"""
+    archive_filepath = os.path.join(archive_folder, os.path.basename(input_file))
+    if os.path.exists(archive_filepath):
+        base, ext = os.path.splitext(os.path.basename(input_file))
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        archive_filepath = os.path.join(archive_folder, f"{base}_{timestamp}{ext}")
+
+    shutil.move(input_file, archive_filepath)
+    return archive_filepath
+
+
+def process_receiving_file(input_file, output_folder, archive_folder, header_block, executor=None,
+                           log=print, progress=None, timer=None):
+    """处理单个收货明细文件：分组生成对帐单后归档源文件
+
+    progress 为每完成一个分组调用一次的回调，参数为 (已完成分组数, 分组总数)；
+    timer 为 StageTimer 时记录读取、生成对帐单和归档各阶段的耗时。
+    返回 True 表示已生成并归档；文件内容不符合要求时记录警告并返回 False；
+    有对帐单生成失败时抛出 RuntimeError，源文件不归档。
+    """
+    with optional_stage(timer, '读取'):
+        columns, earliest_date, groups = group_receiving_export(input_file)
+
+    # 检查表头
+    missing_columns = set(EXPECTED_HEADERS) - set(columns)
+    if missing_columns:
+        log(f"警告：文件缺少以下列：{', '.join(missing_columns)}")
+        return False
+
+    # 收货日期已在读取时转换为 YYYY-MM-DD
+    year_month = datetime.strptime(earliest_date, '%Y-%m-%d').strftime('%Y-%m') if earliest_date else None
+
+    if not year_month:
+        log("警告：文件中没有有效的收货日期，无法确定年月。")
+        return False
+
+    # 创建年月子文件夹
+    year_month_folder = os.path.join(output_folder, year_month)
+    os.makedirs(year_month_folder, exist_ok=True)
+
+    with optional_stage(timer, '生成对帐单'):
+        # 处理每个分组，完成一个分组更新一次进度
+        total_groups = len(groups)
+        failed_groups = 0
+        statements = render_statements(groups, year_month, year_month_folder, header_block, executor)
+        for done_groups, (group_name, output_filename, error) in enumerate(statements, start=1):
+            if error is None:
+                log(f"已成功创建 {output_filename}")
+            else:
+                failed_groups += 1
+                log(f"警告：生成 {group_name} 对帐单时出错: {str(error)}")
+            if progress is not None:
+                progress(done_groups, total_groups)
+
+    if failed_groups:
+        raise RuntimeError(f"{failed_groups} 个对帐单生成失败，文件未归档")
+
+    # 归档文件
+    with optional_stage(timer, '归档'):
+        archive_file(input_file, archive_folder)
+    log(f"已成功归档文件 {os.path.basename(input_file)}")
+    return True
+
+
+def run_batch(input_files, output_folder='export', archive_folder='archive', workers=1, header_file=None,
+              log=print, progress=None, timer=None):
+    """依次处理多个收货明细文件，整个批次共用一个进程池
+
+    progress 回调参数为总体完成百分比（0-100）。返回 (成功文件数, 失败文件数)。
+    处理完成后记录各阶段耗时汇总，并写出 JSON 耗时报告；timer 可传入已有的 StageTimer。
+    """
+    timer = timer or StageTimer('bldbuy')
+    input_files = [f for f in input_files if f]
+    header_file = header_file or os.path.join(os.getcwd(), 'header.xlsx')
+
+    # 确保文件夹存在
+    for folder in [output_folder, archive_folder]:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+            log(f"创建文件夹: {folder}")
+
+    total_files = len(input_files)
+    succeeded = failed = 0
+
+    # 并行生成对帐单的进程池，整个批次共用
+    executor = create_executor(workers)
+    try:
+        for processed_files, input_file in enumerate(input_files):
+            log(f"\n正在处理文件: {os.path.basename(input_file)}")
+
+            def file_progress(done_groups, total_groups, processed_files=processed_files):
+                if progress is not None:
+                    progress(int((processed_files + done_groups / total_groups) / total_files * 100))
+
+            try:
+                # 读取header.xlsx生成标题块（按修改时间和大小缓存，文件有改动时才重新读取）
+                header_block = load_header_block(header_file)
+                if header_block is None:
+                    header_block = build_header_block([])
+                    log("警告：未找到header.xlsx文件,将会导致对帐单标题错误")
+
+                if process_receiving_file(input_file, output_folder, archive_folder, header_block, executor,
+                                          log, file_progress, timer):
+                    succeeded += 1
+                else:
+                    failed += 1
+            except Exception as e:
+                failed += 1
+                log(f"处理文件 {os.path.basename(input_file)} 时出错: {str(e)}")
+
+            if progress is not None:
+                progress(int((processed_files + 1) / total_files * 100))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    log("\n所有文件处理完成。")
+    log(timer.summary())
+    timer.write_report(files=total_files, succeeded=succeeded, failed=failed, workers=workers)
+    return succeeded, failed
@@ -0,0 +1,10 @@
+"""采购对帐单生成的默认并行进程数
+
+只依赖标准库：界面启动时即可导入，不会提前加载 pandas；bldbuy_engine 和命令行使用同一个函数。
+"""
+import os
+
+
+def default_workers():
+    """默认并行进程数：CPU 核数，最多 4 个"""
+    return max(1, min(4, os.cpu_count() or 1))
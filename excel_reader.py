@@ -0,0 +1,303 @@
+"""各工具共用的 Excel 读取层
+
+读取后端按以下顺序选择，可通过环境变量 EXCEL_READER_BACKEND 指定：
+  calamine  - 已安装 python-calamine 时使用（Rust 实现，支持 .xlsx/.xlsm/.xls）
+  sax       - 内置的流式读取器，直接用 iterparse 解析压缩包中的工作表 XML（.xlsx/.xlsm）
+  openpyxl  - pandas 默认引擎，其它后端不可用或解析失败时使用（.xls 使用 xlrd）
+"""
+import importlib.util
+import os
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from pandas.errors import ParserError
+
+BACKENDS = ('calamine', 'sax', 'openpyxl')
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_ROW = _MAIN_NS + 'row'
+_CELL = _MAIN_NS + 'c'
+_VALUE = _MAIN_NS + 'v'
+_INLINE_STRING = _MAIN_NS + 'is'
+_TEXT = _MAIN_NS + 't'
+
+_CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+
+
+def _is_xlsx(file_path):
+    return os.path.splitext(file_path)[1].lower() in ('.xlsx', '.xlsm')
+
+
+def available_backends():
+    """当前环境可用的读取后端"""
+    backends = []
+    if importlib.util.find_spec('python_calamine') is not None:
+        backends.append('calamine')
+    backends += ['sax', 'openpyxl']
+    return backends
+
+
+def resolve_backend(file_path, backend=None):
+    """确定读取某个文件使用的后端"""
+    backend = backend or os.environ.get('EXCEL_READER_BACKEND') or 'auto'
+    if backend not in BACKENDS and backend != 'auto':
+        raise ValueError(f"未知的读取后端: {backend}")
+
+    available = available_backends()
+    if backend == 'auto':
+        backend = available[0]
+    elif backend not in available:
+        backend = 'openpyxl'
+
+    # sax 只支持 .xlsx/.xlsm
+    if backend == 'sax' and not _is_xlsx(file_path):
+        backend = 'openpyxl'
+    return backend
+
+
+def _column_index(letters, _cache={}):
+    """列字母转换为从0开始的列号"""
+    index = _cache.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + ord(char) - 64
+        index -= 1
+        _cache[letters] = index
+    return index
+
+
+class _XlsxPackage:
+    """xlsx 压缩包中读取工作表所需的元数据：工作表路径、共享字符串、日期格式"""
+
+    def __init__(self, file_path):
+        self.zip = zipfile.ZipFile(file_path)
+        self.sheets = self._read_sheets()
+        self.shared_strings = self._read_shared_strings()
+        self.date_styles, self.epoch = self._read_date_styles()
+
+    def close(self):
+        self.zip.close()
+
+    def _read_sheets(self):
+        workbook = ET.fromstring(self.zip.read('xl/workbook.xml'))
+        rels = ET.fromstring(self.zip.read('xl/_rels/workbook.xml.rels'))
+        targets = {}
+        for rel in rels.iter(_PKG_REL_NS + 'Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            targets[rel.get('Id')] = target
+
+        sheets = []
+        for sheet in workbook.iter(_MAIN_NS + 'sheet'):
+            sheets.append((sheet.get('name'), targets[sheet.get(_REL_NS + 'id')]))
+
+        self.date1904 = False
+        for pr in workbook.iter(_MAIN_NS + 'workbookPr'):
+            self.date1904 = pr.get('date1904') in ('1', 'true')
+        return sheets
+
+    def _read_shared_strings(self):
+        if 'xl/sharedStrings.xml' not in self.zip.namelist():
+            return []
+        strings = []
+        with self.zip.open('xl/sharedStrings.xml') as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag == _MAIN_NS + 'si':
+                    # 空字符串按空单元格处理
+                    strings.append(''.join(t.text or '' for t in elem.iter(_TEXT)) or None)
+                    elem.clear()
+        return strings
+
+    def _read_date_styles(self):
+        from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+        from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+
+        epoch = CALENDAR_MAC_1904 if self.date1904 else CALENDAR_WINDOWS_1900
+        if 'xl/styles.xml' not in self.zip.namelist():
+            return set(), epoch
+
+        styles = ET.fromstring(self.zip.read('xl/styles.xml'))
+        formats = dict(BUILTIN_FORMATS)
+        for fmt in styles.iter(_MAIN_NS + 'numFmt'):
+            formats[int(fmt.get('numFmtId'))] = fmt.get('formatCode')
+
+        date_styles = set()
+        cell_xfs = styles.find(_MAIN_NS + 'cellXfs')
+        if cell_xfs is not None:
+            for idx, xf in enumerate(cell_xfs.iter(_MAIN_NS + 'xf')):
+                code = formats.get(int(xf.get('numFmtId', 0)))
+                if code and is_date_format(code):
+                    date_styles.add(str(idx))
+        return date_styles, epoch
+
+    def sheet_path(self, sheet_name=None):
+        if sheet_name is None or sheet_name == 0:
+            return self.sheets[0][1]
+        if isinstance(sheet_name, int):
+            return self.sheets[sheet_name][1]
+        for name, path in self.sheets:
+            if name == sheet_name:
+                return path
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    def iter_rows(self, sheet_name=None, min_row=1):
+        """按行产出单元格值（列表），行号从1开始，缺失的行以空列表补齐"""
+        from openpyxl.utils.datetime import from_excel
+
+        shared_strings = self.shared_strings
+        date_styles = self.date_styles
+        epoch = self.epoch
+
+        next_row = 1
+        with self.zip.open(self.sheet_path(sheet_name)) as f:
+            row = []
+            for _, elem in ET.iterparse(f):
+                tag = elem.tag
+                if tag == _CELL:
+                    ref = elem.get('r')
+                    if ref is not None:
+                        col = _column_index(_CELL_REF.match(ref).group(1))
+                    else:
+                        col = len(row)
+
+                    cell_type = elem.get('t', 'n')
+                    if cell_type == 'inlineStr':
+                        node = elem.find(_INLINE_STRING)
+                        if node is not None:
+                            value = ''.join(t.text or '' for t in node.iter(_TEXT))
+                        else:
+                            value = None
+                    else:
+                        node = elem.find(_VALUE)
+                        value = node.text if node is not None else None
+                        if value is not None:
+                            if cell_type == 'n':
+                                value = float(value) if ('.' in value or 'E' in value or 'e' in value) else int(value)
+                                if elem.get('s') in date_styles:
+                                    value = from_excel(value, epoch)
+                            elif cell_type == 's':
+                                value = shared_strings[int(value)]
+                            elif cell_type == 'b':
+                                value = value == '1'
+                            elif cell_type == 'e':
+                                value = None
+
+                    if col >= len(row):
+                        row.extend([None] * (col - len(row) + 1))
+                    row[col] = value
+                    elem.clear()
+
+                elif tag == _ROW:
+                    row_number = int(elem.get('r', next_row))
+                    while next_row < row_number:
+                        if next_row >= min_row:
+                            yield []
+                        next_row += 1
+                    if row_number >= min_row:
+                        yield row
+                    next_row = row_number + 1
+                    row = []
+                    elem.clear()
+
+
+def iter_sheet_rows(file_path, sheet_name=None, min_row=1, backend=None):
+    """逐行读取工作表的值（只读、流式），sheet_name 为 None 时读取第一个工作表"""
+    backend = resolve_backend(file_path, backend)
+
+    if backend == 'sax':
+        package = _XlsxPackage(file_path)
+        try:
+            yield from package.iter_rows(sheet_name, min_row)
+        finally:
+            package.close()
+        return
+
+    if backend == 'calamine':
+        from python_calamine import CalamineWorkbook
+
+        workbook = CalamineWorkbook.from_path(file_path)
+        if sheet_name is None or isinstance(sheet_name, int):
+            sheet = workbook.get_sheet_by_index(sheet_name or 0)
+        else:
+            sheet = workbook.get_sheet_by_name(sheet_name)
+        for row_number, row in enumerate(sheet.iter_rows(), start=1):
+            if row_number >= min_row:
+                yield [None if value == '' else value for value in row]
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filename=file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active if sheet_name is None else (wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name])
+        ws.reset_dimensions()
+        for row in ws.iter_rows(min_row=min_row, values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def _rows_to_frame(rows, skiprows=0):
+    """按 pandas.read_excel 的规则把行数据转换为 DataFrame（表头、空行、空值和类型推断）
+
+    rows 为从第一行开始的全部行，与 pandas 一样由 TextParser 跳过前 skiprows 行。
+    """
+    from pandas.errors import EmptyDataError
+    from pandas.io.parsers import TextParser
+
+    data = []
+    last_row_with_data = -1
+    for row in rows:
+        # 与 pandas 一致：空单元格为空字符串，去掉行尾空单元格，空行保留
+        row = ['' if value is None else value for value in row]
+        while row and row[-1] == '':
+            row.pop()
+        if row:
+            last_row_with_data = len(data)
+        data.append(row)
+
+    # 去掉末尾的空行，其余各行补齐到最宽一行的列数
+    data = data[:last_row_with_data + 1]
+    if not data:
+        return pd.DataFrame()
+    max_width = max(len(row) for row in data)
+    data = [row + [''] * (max_width - len(row)) for row in data]
+
+    try:
+        parser = TextParser(data, header=0, skiprows=skiprows, skip_blank_lines=False)
+    except EmptyDataError:
+        return pd.DataFrame()
+    try:
+        return parser.read()
+    except EmptyDataError:
+        return pd.DataFrame()
+    finally:
+        parser.close()
+
+
+def read_sheet(file_path, sheet_name=0, skiprows=0, backend=None):
+    """读取工作表为 DataFrame，参数与 pd.read_excel(header=0) 相同"""
+    backend = resolve_backend(file_path, backend)
+
+    if backend == 'calamine':
+        return pd.read_excel(file_path, sheet_name=sheet_name, skiprows=skiprows, engine='calamine')
+
+    if backend == 'sax':
+        try:
+            return _rows_to_frame(iter_sheet_rows(file_path, sheet_name, backend='sax'), skiprows)
+        except (KeyError, zipfile.BadZipFile, ET.ParseError, ParserError):
+            # 非标准结构的文件交给 openpyxl 处理
+            pass
+
+    engine = 'openpyxl' if _is_xlsx(file_path) else None
+    return pd.read_excel(file_path, sheet_name=sheet_name, skiprows=skiprows, engine=engine)
@@ -0,0 +1,171 @@
+"""已解析数据的本地缓存
+
+以源文件内容的哈希为键，把清理后的 DataFrame 保存到本地缓存目录，
+同一文件再次运行时直接读取缓存，跳过 Excel 解析。
+已安装 pyarrow 时保存为 Parquet，否则（或数据无法转换为 Parquet 时）保存为 pickle。
+缓存总大小超过上限时按最近使用时间淘汰最旧的条目。
+
+环境变量：
+  PARSE_CACHE           设为 0 时禁用缓存
+  PARSE_CACHE_DIR       缓存目录
+  PARSE_CACHE_MAX_MB    缓存大小上限（MB），默认 512
+"""
+import hashlib
+import importlib.util
+import os
+import tempfile
+
+import pandas as pd
+
+# 清理逻辑变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+DEFAULT_MAX_MB = 512
+
+_EXTENSIONS = ('.parquet', '.pkl')
+
+
+def cache_enabled():
+    return os.environ.get('PARSE_CACHE', '1') != '0'
+
+
+def cache_dir():
+    path = os.environ.get('PARSE_CACHE_DIR')
+    if not path:
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(base, 'finance_tools', 'parse_cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def max_cache_bytes():
+    try:
+        return int(float(os.environ.get('PARSE_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_MAX_MB * 1024 * 1024
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(namespace, file_path, *key_parts):
+    """缓存键：命名空间 + 缓存版本 + 源文件内容哈希 + 其它影响结果的参数"""
+    digest = hashlib.sha256(file_digest(file_path).encode())
+    for part in (CACHE_VERSION,) + key_parts:
+        digest.update(b'\0' + repr(part).encode())
+    return f"{namespace}-{digest.hexdigest()[:40]}"
+
+
+def _find_entry(directory, key):
+    for ext in _EXTENSIONS:
+        path = os.path.join(directory, key + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _load(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def _store(directory, key, df):
+    """先写临时文件再改名，多个进程同时写入同一条目时也不会读到半个文件"""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        ext = '.pkl'
+        if importlib.util.find_spec('pyarrow') is not None:
+            try:
+                df.to_parquet(tmp_path)
+                ext = '.parquet'
+            except Exception:
+                # 混合类型的列等无法写入 Parquet，改用 pickle
+                pass
+        if ext == '.pkl':
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, os.path.join(directory, key + ext))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def evict(directory=None, max_bytes=None):
+    """缓存总大小超过上限时，按最近使用时间从旧到新删除条目"""
+    directory = directory or cache_dir()
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(_EXTENSIONS):
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def load_cached(namespace, file_path, *key_parts):
+    """读取缓存，没有缓存、缓存已禁用或已损坏时返回 None"""
+    if not cache_enabled():
+        return None
+
+    directory = cache_dir()
+    path = _find_entry(directory, cache_key(namespace, file_path, *key_parts))
+    if path is None:
+        return None
+    try:
+        df = _load(path)
+        # 更新修改时间，作为最近使用时间
+        os.utime(path)
+        return df
+    except Exception:
+        # 缓存损坏时重新解析
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+
+def store_cached(namespace, file_path, df, *key_parts):
+    """保存缓存；df 为 None、缓存已禁用或目录不可写时忽略"""
+    if df is None or not cache_enabled():
+        return
+    try:
+        directory = cache_dir()
+        _store(directory, cache_key(namespace, file_path, *key_parts), df)
+        evict(directory)
+    except OSError:
+        # 缓存目录不可写时不影响正常处理
+        pass
+
+
+def cached_frame(namespace, file_path, loader, *key_parts):
+    """返回 loader(file_path) 的结果，源文件内容未变时直接读取缓存
+
+    loader 返回 None 时不缓存；key_parts 为其它影响结果的参数（如科目号）。
+    """
+    df = load_cached(namespace, file_path, *key_parts)
+    if df is None:
+        df = loader(file_path)
+        store_cached(namespace, file_path, df, *key_parts)
+    return df
@@ -0,0 +1,158 @@
+"""银行对帐台帐（SQLite）：记录已核销的银行流水和总帐行，以及上次运行留下的未达项
+
+每次对帐前跳过台帐中已核销的行，并把上次的未达项（本次文件中没有的）结转进来一起匹配；
+对帐后把本次核销的行记入台帐，未达项整体替换为本次的未匹配行。
+这样每月只需处理新增的流水，已核销的历史数据不再重复匹配和列出。
+
+银行流水以 交易流水号 为键（为空时用行内容的哈希）；总帐没有唯一编号，
+以 日期、凭证、摘要、金额 的哈希加同内容行的序号为键。
+不同科目（scope）的记录互不影响。
+"""
+import json
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bank_matching import to_cents
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settled (
+    scope TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    settled_at TEXT NOT NULL,
+    PRIMARY KEY (scope, kind, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS open_items (
+    scope TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    PRIMARY KEY (scope, kind, key)
+) WITHOUT ROWID;
+"""
+
+
+def _row_hashes(frame):
+    """按行计算内容哈希（16位十六进制）"""
+    hashes = pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+    return np.array([format(value, '016x') for value in hashes.tolist()], dtype=object)
+
+
+def bank_row_keys(bank_data):
+    """银行流水的键：有交易流水号时用流水号，否则用行内容哈希"""
+    refs = bank_data['交易流水号'].fillna('').astype(str).str.strip()
+    has_ref = ~refs.isin(['', 'nan', 'None']).to_numpy()
+    hashed = _row_hashes(bank_data[['日期', '对方户名', '用途', '交易金额']])
+    return np.where(has_ref, 'ref:' + refs.to_numpy(dtype=object), 'h:' + hashed)
+
+
+def gl_row_keys(gl_data):
+    """总帐行的键：日期、凭证、摘要、金额（分）的哈希，内容完全相同的行按出现顺序加序号"""
+    content = pd.DataFrame({
+        'date': pd.to_datetime(gl_data['Date'], errors='coerce').dt.strftime('%Y-%m-%d'),
+        'reference': gl_data['Reference'].astype(str),
+        'description': gl_data['Description'].astype(str),
+        'cents': [str(cents) for cents in to_cents(gl_data['Base Amount'])],
+    })
+    hashed = pd.Series(_row_hashes(content), index=gl_data.index)
+    occurrence = hashed.groupby(hashed).cumcount().astype(str)
+    return ('h:' + hashed + '#' + occurrence).to_numpy(dtype=object)
+
+
+class ReconciliationLedger:
+    def __init__(self, path, scope):
+        self.path = path
+        self.scope = str(scope)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def _with_temp_keys(self, keys):
+        """把一批键写入临时表，用于和台帐做连接查询"""
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS candidate_keys (key TEXT PRIMARY KEY)")
+        self.connection.execute("DELETE FROM candidate_keys")
+        self.connection.executemany("INSERT OR IGNORE INTO candidate_keys VALUES (?)", ((key,) for key in keys))
+
+    def settled_mask(self, kind, keys):
+        """keys 中已核销的为 True"""
+        self._with_temp_keys(keys)
+        settled = {row[0] for row in self.connection.execute(
+            "SELECT c.key FROM candidate_keys c JOIN settled s "
+            "ON s.scope = ? AND s.kind = ? AND s.key = c.key", (self.scope, kind))}
+        return np.array([key in settled for key in keys], dtype=bool)
+
+    def carried_items(self, kind, columns, exclude_keys):
+        """上次运行留下、且不在 exclude_keys 中的未达项，返回 (DataFrame, 键数组)"""
+        records, keys = [], []
+        for key, data in self.connection.execute(
+                "SELECT key, data FROM open_items WHERE scope = ? AND kind = ?", (self.scope, kind)):
+            if key not in exclude_keys:
+                records.append(json.loads(data))
+                keys.append(key)
+        frame = pd.DataFrame.from_records(records, columns=columns)
+        return frame, np.array(keys, dtype=object)
+
+    def _prepare_side(self, kind, data, keys):
+        settled = self.settled_mask(kind, keys)
+        carried, carried_keys = self.carried_items(kind, list(data.columns), set(keys))
+        frame = pd.concat([data[~settled], carried], ignore_index=True) if len(carried) else data[~settled]
+        return frame.reset_index(drop=True), np.concatenate([keys[~settled], carried_keys]), int(settled.sum()), len(carried)
+
+    def prepare(self, bank_data, gl_data):
+        """去掉已核销的行并结转上次的未达项
+
+        返回 (银行流水, 总帐, 银行键, 总帐键, 统计)，统计为各类跳过 / 结转的行数。
+        """
+        bank, bank_keys, bank_skipped, bank_carried = self._prepare_side('bank', bank_data, bank_row_keys(bank_data))
+        gl, gl_keys, gl_skipped, gl_carried = self._prepare_side('gl', gl_data, gl_row_keys(gl_data))
+        # 结束临时表操作开启的事务，释放读锁，其它科目的台帐连接才能写入
+        self.connection.commit()
+
+        # 结转的行从 JSON 恢复，类型与新读取的数据保持一致
+        if gl_carried:
+            gl['Date'] = pd.to_datetime(gl['Date'], errors='coerce').dt.date
+        if bank_carried:
+            bank['交易流水号'] = bank['交易流水号'].astype(str)
+
+        stats = {
+            'bank_skipped': bank_skipped, 'gl_skipped': gl_skipped,
+            'bank_carried': bank_carried, 'gl_carried': gl_carried,
+        }
+        return bank, gl, bank_keys, gl_keys, stats
+
+    def _replace_open_items(self, kind, frame, keys, now):
+        records = json.loads(frame.to_json(orient='records', date_format='iso', force_ascii=False)) if len(frame) else []
+        self._with_temp_keys(keys)
+        self.connection.execute(
+            "DELETE FROM open_items WHERE scope = ? AND kind = ? AND key NOT IN (SELECT key FROM candidate_keys)",
+            (self.scope, kind))
+        # 已在台帐中的未达项保留首次出现的时间
+        self.connection.executemany(
+            "INSERT INTO open_items (scope, kind, key, data, first_seen) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (scope, kind, key) DO UPDATE SET data = excluded.data",
+            ((self.scope, kind, key, json.dumps(record, ensure_ascii=False), now) for key, record in zip(keys, records)))
+
+    def record(self, bank_data, gl_data, bank_keys, gl_keys, pairs, groups):
+        """记录本次核销的行，并把其余行保存为未达项（参数为 prepare 的结果和匹配结果）"""
+        now = datetime.now().isoformat(timespec='seconds')
+        bank_matched = [bank_position for bank_position, _ in pairs] + [p for group_bank, _ in groups for p in group_bank]
+        gl_matched = [gl_position for _, gl_position in pairs] + [p for _, group_gl in groups for p in group_gl]
+
+        with self.connection:
+            for kind, keys, matched in (('bank', bank_keys, bank_matched), ('gl', gl_keys, gl_matched)):
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO settled (scope, kind, key, settled_at) VALUES (?, ?, ?, ?)",
+                    ((self.scope, kind, keys[position], now) for position in matched))
+
+            for kind, frame, keys, matched in (('bank', bank_data, bank_keys, bank_matched),
+                                               ('gl', gl_data, gl_keys, gl_matched)):
+                open_mask = np.ones(len(frame), dtype=bool)
+                open_mask[matched] = False
+                self._replace_open_items(kind, frame[open_mask], keys[open_mask], now)
@@ -0,0 +1,115 @@
+"""流程各阶段的耗时和内存统计
+
+    timer = StageTimer('ap_aging')
+    with timer.stage('读取'):
+        ...
+    log(timer.summary())
+    timer.write_report()
+
+同名阶段多次执行（如逐个文件读取）时累加耗时、记录次数。每次运行写出一个 JSON 报告，便于逐月对比。
+阶段不要嵌套；子进程中的内存不在统计范围内。
+
+环境变量：
+  STAGE_TIMER_MEMORY   设为 1 时用 tracemalloc 记录各阶段的内存峰值（会使运行变慢）
+  STAGE_TIMER_DIR      报告目录，默认为本地缓存目录下的 finance_tools/timings
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+
+def memory_tracing_enabled():
+    return os.environ.get('STAGE_TIMER_MEMORY', '0') == '1'
+
+
+def report_dir():
+    path = os.environ.get('STAGE_TIMER_DIR')
+    if not path:
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(base, 'finance_tools', 'timings')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def optional_stage(timer, name):
+    """timer 为 None 时不计时，供可选传入计时器的函数使用"""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+class StageTimer:
+    def __init__(self, pipeline, trace_memory=None):
+        self.pipeline = pipeline
+        self.trace_memory = memory_tracing_enabled() if trace_memory is None else trace_memory
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """记录 with 块的耗时；开启内存统计时同时记录块内的内存峰值"""
+        tracing = self.trace_memory
+        started_tracing = tracing and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if tracing:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'count': 0})
+            entry['seconds'] += elapsed
+            entry['count'] += 1
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                peak_mb = max(0, peak - base) / (1024 * 1024)
+                entry['peak_mb'] = max(entry.get('peak_mb', 0.0), peak_mb)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def total_seconds(self):
+        return time.perf_counter() - self._start
+
+    def summary(self):
+        """一行汇总，如：耗时统计：读取 1.20s | 透视 0.10s | 保存 0.50s | 合计 1.85s"""
+        parts = []
+        for name, entry in self.stages.items():
+            part = f"{name} {entry['seconds']:.2f}s"
+            if 'peak_mb' in entry:
+                part += f" ({entry['peak_mb']:.0f}MB)"
+            parts.append(part)
+        parts.append(f"合计 {self.total_seconds():.2f}s")
+        return "耗时统计：" + " | ".join(parts)
+
+    def report(self, **extra):
+        """JSON 报告内容，extra 为附加信息（如行数、文件数）"""
+        return {
+            'pipeline': self.pipeline,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': round(self.total_seconds(), 4),
+            'trace_memory': self.trace_memory,
+            'stages': [
+                dict(name=name, **{key: round(value, 4) if isinstance(value, float) else value
+                                   for key, value in entry.items()})
+                for name, entry in self.stages.items()
+            ],
+            **extra,
+        }
+
+    def write_report(self, directory=None, **extra):
+        """写出本次运行的 JSON 报告，返回文件路径；目录不可写时返回 None"""
+        try:
+            directory = directory or report_dir()
+            file_name = f"{self.pipeline}_{self.started_at.strftime('%Y%m%d_%H%M%S_%f')}.json"
+            path = os.path.join(directory, file_name)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.report(**extra), f, ensure_ascii=False, indent=2)
+            return path
+        except OSError:
+            return None
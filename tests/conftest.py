@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# 各模块在仓库根目录下直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_bank_frame(rows, refs=None):
+    """银行流水：rows 为 (日期, 对方户名, 交易金额)，refs 为交易流水号，默认 T0、T1..."""
+    if refs is None:
+        refs = [f'T{i}' for i in range(len(rows))]
+    return pd.DataFrame({
+        '日期': [row[0] for row in rows],
+        '对方户名': [row[1] for row in rows],
+        '用途': [''] * len(rows),
+        '交易流水号': list(refs),
+        '借方/贷方': [''] * len(rows),
+        '交易金额': [row[2] for row in rows],
+    })
+
+
+def make_gl_frame(rows, refs=None):
+    """总帐：rows 为 (日期, 摘要, 金额)，refs 为凭证号，默认 V0、V1...
+
+    Date 与 clean_gl_data 的结果一样为 datetime.date。
+    """
+    if refs is None:
+        refs = [f'V{i}' for i in range(len(rows))]
+    return pd.DataFrame({
+        'Date': pd.to_datetime(pd.Series([row[0] for row in rows], dtype=object)).dt.date,
+        'Description': [row[1] for row in rows],
+        'Base Amount': [row[2] for row in rows],
+        'Reference': list(refs),
+    })
+
+
+@pytest.fixture
+def bank_frame():
+    return make_bank_frame
+
+
+@pytest.fixture
+def gl_frame():
+    return make_gl_frame
@@ -0,0 +1,221 @@
+import time
+
+import pandas as pd
+import pytest
+
+import bank_matching
+from bank_matching import _BudgetExceeded, find_subset, match_all, match_exact, match_groups, match_window, to_cents
+
+
+def test_to_cents_rounds_float_amounts():
+    assert to_cents(pd.Series([0.1 + 0.2, 1234.56, -19.99, None, 'abc'])) == [30, 123456, -1999, None, None]
+
+
+def test_match_exact_matches_float_amounts_by_cents(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-01', '甲公司', 0.1 + 0.2)])
+    gl = gl_frame([('2024-03-01', '甲公司', 0.3)])
+
+    assert match_exact(bank, gl) == [(0, 0)]
+
+
+def test_match_exact_claims_duplicate_gl_amounts_in_order(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-01', '甲公司', 100.00),
+                       ('2024-03-02', '乙公司', 100.00),
+                       ('2024-03-03', '丙公司', 100.00)])
+    gl = gl_frame([('2024-03-01', 'a', 100.00),
+                   ('2024-03-01', 'b', -100.00),
+                   ('2024-03-02', 'c', 100.00)])
+
+    # 先到先得：每条 GL 只用一次，方向不同的金额不匹配，多出的银行流水留作未匹配
+    assert match_exact(bank, gl) == [(0, 0), (1, 2)]
+
+
+def test_match_exact_skips_zero_and_blank_amounts(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-01', '甲公司', 0.0), ('2024-03-01', '甲公司', None)])
+    gl = gl_frame([('2024-03-01', 'a', 0.0), ('2024-03-01', 'b', None)])
+
+    assert match_exact(bank, gl) == []
+
+
+def test_match_window_picks_nearest_date(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-10', '甲公司', 100.00)])
+    gl = gl_frame([('2024-03-01', 'a', 100.00),
+                   ('2024-03-09', 'b', 100.00),
+                   ('2024-03-20', 'c', 100.00)])
+
+    assert match_window(bank, gl) == [(0, 1)]
+
+
+def test_match_window_respects_window_days(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-10', '甲公司', 100.00)])
+    gl = gl_frame([('2024-03-01', 'a', 100.00)])
+
+    assert match_window(bank, gl, window_days=5) == []
+    assert match_window(bank, gl, window_days=9) == [(0, 0)]
+
+
+def test_match_window_tolerance_prefers_date_then_amount(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-10', '甲公司', 100.00),
+                       ('2024-03-10', '乙公司', 200.00)])
+    gl = gl_frame([('2024-03-10', 'a', 100.40),
+                   ('2024-03-01', 'b', 100.00),
+                   ('2024-03-10', 'c', 200.30),
+                   ('2024-03-10', 'd', 199.90),
+                   ('2024-03-10', 'e', 202.00)])
+
+    assert match_window(bank, gl) == [(0, 1)]
+    assert match_window(bank, gl, tolerance=0.5) == [(0, 0), (1, 3)]
+
+
+def test_match_window_tolerance_does_not_cross_zero(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-10', '甲公司', 0.50),
+                       ('2024-03-10', '乙公司', -0.20)])
+    gl = gl_frame([('2024-03-10', 'a', -0.30),
+                   ('2024-03-10', 'b', 0.40)])
+
+    # 容差内只有方向相反的金额时不匹配
+    assert match_window(bank.iloc[[0]], gl.iloc[[0]], tolerance=1.0) == []
+    assert match_window(bank.iloc[[1]], gl.iloc[[1]].reset_index(drop=True), tolerance=1.0) == []
+    assert match_window(bank, gl, tolerance=1.0) == [(0, 1), (1, 0)]
+
+
+def test_split_payment_one_bank_to_many_gl(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-05', '甲公司', 300.00)])
+    gl = gl_frame([('2024-03-04', '甲公司 货款1', 100.00),
+                   ('2024-03-05', '甲公司 货款2', 200.00),
+                   ('2024-03-05', '乙公司', 50.00)])
+
+    groups = match_groups(bank, gl, pairs=[])
+
+    assert len(groups) == 1
+    assert groups[0][0] == [0]
+    assert sorted(groups[0][1]) == [0, 1]
+
+
+def test_combined_payment_many_bank_to_one_gl(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-01', '甲公司', 120.50),
+                       ('2024-03-02', '甲公司', 79.50),
+                       ('2024-03-02', '乙公司', 33.00)])
+    gl = gl_frame([('2024-03-03', '甲公司 合并付款', 200.00)])
+
+    groups = match_groups(bank, gl, pairs=[])
+
+    assert len(groups) == 1
+    assert sorted(groups[0][0]) == [0, 1]
+    assert groups[0][1] == [0]
+
+
+def test_groups_require_counterparty_in_gl_description(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-05', '甲公司', 300.00),
+                       ('2024-03-05', '乙公司', 80.00),
+                       ('2024-03-05', '乙公司', 20.00)])
+    gl = gl_frame([('2024-03-05', '丙公司', 100.00),
+                   ('2024-03-05', '丙公司', 200.00),
+                   ('2024-03-05', '丁公司', 100.00)])
+
+    assert match_groups(bank, gl, pairs=[]) == []
+
+    groups = match_groups(bank, gl, pairs=[], any_counterparty=True)
+    assert [(group_bank, sorted(group_gl)) for group_bank, group_gl in groups] == [([0], [0, 1]), ([1, 2], [2])]
+
+
+def test_match_all_group_pass_is_off_by_default(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-05', '甲公司', 300.00)])
+    gl = gl_frame([('2024-03-05', '甲公司', 100.00),
+                   ('2024-03-05', '甲公司', 200.00)])
+
+    assert match_all(bank, gl) == ([], [])
+    assert match_all(bank, gl, group_pass=True)[1] == [([0], [1, 0])]
+
+
+def test_rows_are_not_reused_across_groups(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-05', '甲公司', 300.00),
+                       ('2024-03-05', '甲公司', 300.00)])
+    # 只够组成一组 300：第二笔银行流水不能再用同样的 GL 行
+    gl = gl_frame([('2024-03-05', '甲公司', 100.00),
+                   ('2024-03-05', '甲公司', 200.00),
+                   ('2024-03-05', '甲公司', 150.00)])
+
+    groups = match_groups(bank, gl, pairs=[])
+
+    bank_used = [p for group_bank, _ in groups for p in group_bank]
+    gl_used = [p for _, group_gl in groups for p in group_gl]
+    assert len(groups) == 1
+    assert len(bank_used) == len(set(bank_used))
+    assert len(gl_used) == len(set(gl_used))
+
+
+def test_rows_matched_in_first_pass_are_excluded(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-05', '甲公司', 100.00),
+                       ('2024-03-05', '甲公司', 300.00)])
+    gl = gl_frame([('2024-03-05', '甲公司', 100.00),
+                   ('2024-03-05', '甲公司', 200.00)])
+
+    # GL 0 已在第一轮和银行 0 匹配，银行 1 凑不出 300
+    assert match_groups(bank, gl, pairs=[(0, 0)]) == []
+
+
+def test_date_window_limits_candidates(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-10', '甲公司', 300.00)])
+    gl = gl_frame([('2024-03-10', '甲公司', 100.00),
+                   ('2024-03-01', '甲公司', 200.00)])
+
+    assert match_groups(bank, gl, pairs=[], window_days=7) == []
+    assert len(match_groups(bank, gl, pairs=[], window_days=10)) == 1
+
+
+def test_find_subset_raises_after_deadline():
+    with pytest.raises(_BudgetExceeded):
+        find_subset(300, [200, 150, 100], max_size=6, deadline=0)
+
+
+def test_total_budget_stops_without_error(bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-05', '甲公司', 300.00)])
+    gl = gl_frame([('2024-03-05', '甲公司', 100.00),
+                   ('2024-03-05', '甲公司', 200.00)])
+
+    assert match_groups(bank, gl, pairs=[], time_budget=0) == []
+
+
+def test_target_timeout_skips_only_that_target(monkeypatch, bank_frame, gl_frame):
+    bank = bank_frame([('2024-03-05', '甲公司', 300.00),
+                       ('2024-03-05', '乙公司', 70.00)])
+    gl = gl_frame([('2024-03-05', '甲公司', 100.00),
+                   ('2024-03-05', '甲公司', 200.00),
+                   ('2024-03-05', '乙公司', 30.00),
+                   ('2024-03-05', '乙公司', 40.00)])
+
+    real_find_subset = bank_matching.find_subset
+
+    def slow_for_300(target, values, max_size, deadline):
+        # 模拟 300 的搜索超时
+        if target == 30000:
+            raise _BudgetExceeded
+        return real_find_subset(target, values, max_size, deadline)
+
+    monkeypatch.setattr(bank_matching, 'find_subset', slow_for_300)
+    groups = match_groups(bank, gl, pairs=[])
+
+    assert [(group_bank, sorted(group_gl)) for group_bank, group_gl in groups] == [([1], [2, 3])]
+
+
+def test_target_budget_is_configurable(monkeypatch, bank_frame, gl_frame):
+    deadlines = []
+    real_find_subset = bank_matching.find_subset
+
+    def record_deadline(target, values, max_size, deadline):
+        deadlines.append(deadline - time.perf_counter())
+        return real_find_subset(target, values, max_size, deadline)
+
+    monkeypatch.setattr(bank_matching, 'find_subset', record_deadline)
+    bank = bank_frame([('2024-03-05', '甲公司', 300.00)])
+    gl = gl_frame([('2024-03-05', '甲公司', 100.00),
+                   ('2024-03-05', '甲公司', 200.00)])
+
+    match_groups(bank, gl, pairs=[], target_budget=2.5)
+    assert deadlines and all(1.5 < remaining <= 2.5 for remaining in deadlines)
+
+    # 单个目标的上限不会超过总耗时上限
+    deadlines.clear()
+    match_groups(bank, gl, pairs=[], time_budget=0.5, target_budget=2.5)
+    assert deadlines and all(remaining <= 0.5 for remaining in deadlines)
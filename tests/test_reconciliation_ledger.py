@@ -0,0 +1,103 @@
+from datetime import date
+
+import pytest
+
+from bank_matching import match_exact
+from reconciliation_ledger import ReconciliationLedger, bank_row_keys, gl_row_keys
+
+DAY = '2024-03-01'
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = ReconciliationLedger(str(tmp_path / 'ledger.db'), '115307')
+    yield ledger
+    ledger.close()
+
+
+def run_once(ledger, bank_data, gl_data):
+    """按 main 的顺序跑一次：prepare、一对一匹配、record，返回 (银行, 总帐, 匹配, 统计)"""
+    bank, gl, bank_keys, gl_keys, stats = ledger.prepare(bank_data, gl_data)
+    pairs = match_exact(bank, gl)
+    ledger.record(bank, gl, bank_keys, gl_keys, pairs, [])
+    return bank, gl, pairs, stats
+
+
+def test_bank_keys_use_reference_or_content_hash(bank_frame):
+    bank_data = bank_frame([(DAY, '甲公司', 100.0), (DAY, '甲公司', 50.0), (DAY, '甲公司', 50.0)],
+                           refs=['T1', '', None])
+    keys = bank_row_keys(bank_data)
+
+    assert keys[0] == 'ref:T1'
+    assert keys[1].startswith('h:') and keys[1] == keys[2]
+
+
+def test_identical_gl_rows_get_occurrence_keys(gl_frame):
+    keys = gl_row_keys(gl_frame([(DAY, '付款', 100.0), (DAY, '付款', 100.0), (DAY, '收款', 100.0)], refs=['V1'] * 3))
+
+    assert keys[0].endswith('#0') and keys[1].endswith('#1')
+    assert keys[0].split('#')[0] == keys[1].split('#')[0]
+    assert keys[2].endswith('#0') and keys[2] != keys[0]
+
+
+def test_settled_rows_are_skipped_on_rerun(ledger, bank_frame, gl_frame):
+    bank_data = bank_frame([(DAY, '甲公司', 100.0), (DAY, '甲公司', 50.0)], refs=['T1', 'T2'])
+    gl_data = gl_frame([(DAY, '付款', 100.0), (DAY, '其它', 70.0)])
+
+    _, _, pairs, stats = run_once(ledger, bank_data, gl_data)
+    assert pairs == [(0, 0)]
+    assert stats['bank_skipped'] == 0 and stats['gl_skipped'] == 0
+
+    bank, gl, pairs, stats = run_once(ledger, bank_data, gl_data)
+    assert stats == {'bank_skipped': 1, 'gl_skipped': 1, 'bank_carried': 0, 'gl_carried': 0}
+    assert bank['交易流水号'].tolist() == ['T2']
+    assert gl['Description'].tolist() == ['其它']
+    assert pairs == []
+
+
+def test_open_items_carry_forward_and_settle(ledger, bank_frame, gl_frame):
+    run_once(ledger, bank_frame([(DAY, '甲公司', 100.0), (DAY, '甲公司', 50.0)], refs=['T1', 'T2']),
+             gl_frame([(DAY, '付款', 100.0), (DAY, '其它', 70.0)]))
+
+    # 下月文件只有新增的行，上月的未达项结转进来参与匹配
+    bank, gl, pairs, stats = run_once(ledger, bank_frame([(DAY, '甲公司', 70.0)], refs=['T3']),
+                                      gl_frame([(DAY, '新付款', 50.0)]))
+    assert stats == {'bank_skipped': 0, 'gl_skipped': 0, 'bank_carried': 1, 'gl_carried': 1}
+    assert bank['交易流水号'].tolist() == ['T3', 'T2']
+    assert gl['Description'].tolist() == ['新付款', '其它']
+    assert isinstance(gl['Date'].iloc[1], date)
+    assert sorted((bank['交易流水号'].iloc[b], gl['Description'].iloc[g]) for b, g in pairs) == [
+        ('T2', '新付款'), ('T3', '其它')]
+
+    # 全部核销后不再结转
+    bank, gl, pairs, stats = run_once(ledger, bank_frame([]), gl_frame([]))
+    assert stats['bank_carried'] == 0 and stats['gl_carried'] == 0
+    assert bank.empty and gl.empty
+
+
+def test_only_settled_occurrence_of_identical_gl_rows_is_skipped(ledger, bank_frame, gl_frame):
+    gl_data = gl_frame([(DAY, '付款', 100.0), (DAY, '付款', 100.0)], refs=['V1', 'V1'])
+
+    run_once(ledger, bank_frame([(DAY, '甲公司', 100.0)], refs=['T1']), gl_data)
+    bank, gl, pairs, stats = run_once(
+        ledger, bank_frame([(DAY, '甲公司', 100.0), (DAY, '甲公司', 100.0)], refs=['T1', 'T2']), gl_data)
+
+    assert stats['bank_skipped'] == 1 and stats['gl_skipped'] == 1
+    assert len(gl) == 1 and pairs == [(0, 0)]
+
+
+def test_scopes_are_independent(tmp_path, bank_frame, gl_frame):
+    path = str(tmp_path / 'ledger.db')
+    bank_data = bank_frame([(DAY, '甲公司', 100.0)], refs=['T1'])
+    gl_data = gl_frame([(DAY, '付款', 100.0)])
+
+    first = ReconciliationLedger(path, '115307')
+    other = ReconciliationLedger(path, '115308')
+    try:
+        run_once(first, bank_data, gl_data)
+        _, _, _, stats = run_once(other, bank_data, gl_data)
+    finally:
+        first.close()
+        other.close()
+
+    assert stats['bank_skipped'] == 0 and stats['gl_skipped'] == 0
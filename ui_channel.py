@@ -0,0 +1,98 @@
+"""界面线程与工作线程之间的日志 / 进度通道（两个 Tk 工具共用）
+
+工作线程只把事件放入队列，不直接操作控件；界面线程用 root.after 按固定帧率取出事件，
+同一帧内的日志合并为一次 Text.insert，进度只设置最后一个值。
+"""
+import queue
+
+# 每帧间隔（毫秒），约 20 帧/秒
+FRAME_INTERVAL_MS = 50
+
+# 每帧最多处理的事件数，日志很多时分几帧显示，避免界面卡住
+MAX_EVENTS_PER_FRAME = 2000
+
+
+class UIChannel:
+    def __init__(self, root, log_text, progress=None, interval_ms=FRAME_INTERVAL_MS):
+        self.root = root
+        self.log_text = log_text
+        self.progress = progress
+        self.interval_ms = interval_ms
+        self._events = queue.SimpleQueue()
+        self._after_id = None
+
+    def log(self, message, tag=None):
+        """追加一行日志，tag 为 Text 控件中已配置的标签名（任意线程可调用）"""
+        self._events.put(('log', message, tag))
+
+    def set_progress(self, value):
+        """设置进度条的值（任意线程可调用）"""
+        self._events.put(('progress', value, None))
+
+    def call(self, func, *args, **kwargs):
+        """在界面线程中执行 func，如恢复按钮状态（任意线程可调用）"""
+        self._events.put(('call', func, (args, kwargs)))
+
+    def clear(self):
+        """清空日志和尚未显示的事件（界面线程调用）"""
+        while True:
+            try:
+                self._events.get_nowait()
+            except queue.Empty:
+                break
+        self._with_text_enabled(lambda: self.log_text.delete('1.0', 'end'))
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _with_text_enabled(self, action):
+        # 只读的 Text 控件需要临时改为可编辑
+        state = str(self.log_text.cget('state'))
+        if state != 'normal':
+            self.log_text.config(state='normal')
+        try:
+            action()
+        finally:
+            if state != 'normal':
+                self.log_text.config(state=state)
+
+    def _flush_lines(self, segments):
+        if not segments:
+            return
+        # Text.insert 支持一次插入多段 (文本, 标签)
+        self._with_text_enabled(lambda: self.log_text.insert('end', *segments))
+        self.log_text.see('end')
+
+    def _drain(self):
+        self._after_id = None
+        segments = []
+        progress = None
+        try:
+            for _ in range(MAX_EVENTS_PER_FRAME):
+                try:
+                    kind, value, extra = self._events.get_nowait()
+                except queue.Empty:
+                    break
+
+                if kind == 'log':
+                    segments += [value + "\n", extra or ()]
+                elif kind == 'progress':
+                    progress = value
+                else:
+                    # 按顺序执行：先显示之前的日志
+                    self._flush_lines(segments)
+                    segments = []
+                    args, kwargs = extra
+                    value(*args, **kwargs)
+
+            self._flush_lines(segments)
+            if progress is not None and self.progress is not None:
+                self.progress['value'] = progress
+        finally:
+            self.start()